@@ -3,30 +3,137 @@
 
 import os
 import sys
-import json
+import time
+import asyncio
 import argparse
-import requests
 from pathlib import Path
+from typing import Dict, List, Optional
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None  # requis uniquement pour --all
+
+import _jsonio
+import _http
 
 API_BASE_URL = "https://public-api.meteofrance.fr/public/DPClim/v1"
 ENDPOINT = "liste-stations/quotidienne"
 # API_KEY = os.getenv("METEOFRANCE_API_KEY")
+CACHE_TTL = 24 * 3600  # les listes de stations changent rarement : pas de nouvel appel avant 24h
+# Départements couverts par DPClim (la Corse est regroupée sous 20) et outre-mer
+DEPARTEMENTS = [str(d) for d in range(1, 96)] + [str(d) for d in range(971, 977)]
+
+def conditional_headers(meta: Optional[Dict[str, str]]) -> Dict[str, str]:
+    headers = {}
+    if meta:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last-modified"):
+            headers["If-Modified-Since"] = meta["last-modified"]
+    return headers
 
-def call_api(api_key: str, departement: str, parametre: str, timeout: float) -> dict:
+def update_meta(meta: Dict[str, str], parametre: str, headers) -> None:
+    meta["parametre"] = parametre
+    meta["etag"] = headers.get("ETag", "")
+    meta["last-modified"] = headers.get("Last-Modified", "")
+
+def call_api(api_key: str, departement: str, parametre: str, timeout: float, meta: Optional[Dict[str, str]] = None) -> Optional[dict]:
+    """
+    Appelle l'API et retourne le JSON.
+    'meta' : validateurs HTTP de la réponse précédente ('etag', 'last-modified'). Ils sont envoyés en requête
+    conditionnelle puis mis à jour avec ceux de la nouvelle réponse. Retourne None si la liste n'a pas changé (304).
+    """
     url = f"{API_BASE_URL}/{ENDPOINT}"
-    headers = {
-        "accept": "*/*",
-        "apikey": api_key,
-    }
     params = {
         "id-departement": departement,
         "parametre": parametre,
     }
 
     # Désactivation de la vérification SSL
-    resp = requests.get(url, headers=headers, params=params, timeout=timeout, verify=False)
+    resp = _http.get(api_key, url, params=params, headers=conditional_headers(meta), timeout=timeout, verify=False)
+    if resp.status_code == 304:
+        return None
     resp.raise_for_status()
-    return resp.json()
+
+    if meta is not None:
+        update_meta(meta, parametre, resp.headers)
+    return _jsonio.loads(resp.content)
+
+async def fetch_dept(session: "aiohttp.ClientSession", sem: asyncio.Semaphore, departement: str, parametre: str,
+                     meta: Dict[str, str]) -> Optional[dict]:
+    """
+    Équivalent asynchrone de call_api (au plus 'sem' requêtes simultanées).
+    """
+    params = {
+        "id-departement": departement,
+        "parametre": parametre,
+    }
+    async with sem:
+        async with session.get(f"{API_BASE_URL}/{ENDPOINT}", params=params, headers=conditional_headers(meta)) as r:
+            if r.status == 304:
+                return None
+            r.raise_for_status()
+            update_meta(meta, parametre, r.headers)
+            return _jsonio.loads(await r.read())
+
+async def fetch_all(api_key: str, metas: Dict[str, Dict[str, str]], parametre: str, timeout: float,
+                    concurrency: int = 16) -> List[object]:
+    """
+    Récupère les listes de plusieurs départements sur une seule ClientSession.
+    'metas' : validateurs HTTP par département. Retourne une liste alignée sur 'metas' : JSON, None (304) ou exception.
+    """
+    sem = asyncio.Semaphore(concurrency)
+    # Désactivation de la vérification SSL
+    connector = aiohttp.TCPConnector(limit=concurrency, ssl=False)
+    headers = {
+        "accept": "*/*",
+        "apikey": api_key,
+    }
+    # trust_env : proxies pris des variables d'environnement si présents
+    async with aiohttp.ClientSession(connector=connector, headers=headers, trust_env=True,
+                                     timeout=aiohttp.ClientTimeout(sock_connect=timeout, sock_read=timeout)) as session:
+        return await asyncio.gather(
+            *(fetch_dept(session, sem, d, parametre, meta) for d, meta in metas.items()),
+            return_exceptions=True,
+        )
+
+def load_meta(json_file: Path, parametre: str) -> Dict[str, str]:
+    """
+    Validateurs HTTP enregistrés à côté du fichier JSON ('<departement>.json.meta').
+    Ignorés si le fichier JSON est absent ou s'ils concernent un autre paramètre.
+    """
+    meta_file = json_file.with_name(json_file.name + ".meta")
+    if not json_file.exists() or not meta_file.exists():
+        return {}
+    try:
+        meta = _jsonio.loads(meta_file.read_bytes())
+    except (OSError, _jsonio.JSONDecodeError):
+        return {}
+    return meta if meta.get("parametre") == parametre else {}
+
+def save_meta(json_file: Path, meta: Dict[str, str]):
+    meta_file = json_file.with_name(json_file.name + ".meta")
+    meta_file.write_text(_jsonio.dumps(meta), encoding="utf-8")
+
+def save_list(json_file: Path, data: Optional[dict], meta: Dict[str, str], pretty: bool = False):
+    """
+    Enregistre la liste et ses validateurs; data None (304) : liste inchangée, on repart pour 24h.
+    """
+    if data is None:
+        json_file.touch()
+        print(f"JSON inchangé: {json_file}")
+        return
+    with open(json_file, "w", encoding="utf-8") as f:
+        f.write(_jsonio.dumps(data, indent=pretty))
+    save_meta(json_file, meta)
+    print(f"JSON enregistré dans: {json_file}")
+
+def is_fresh(json_file: Path, meta: Dict[str, str]) -> bool:
+    """
+    Vrai si la liste a été récupérée (pour le même paramètre) il y a moins de CACHE_TTL secondes.
+    """
+    return bool(meta) and time.time() - json_file.stat().st_mtime < CACHE_TTL
 
 def main():
     parser = argparse.ArgumentParser(description="Appel API Météo-France DPClim (SSL désactivé).")
@@ -35,6 +142,10 @@ def main():
     parser.add_argument("--parametre", "-p", default="temperature", help="Paramètre.")
     parser.add_argument("--timeout", "-t", type=float, default=10.0, help="Timeout en secondes.")
     parser.add_argument("--output", "-o", default=None, help="Fichier de sortie JSON.")
+    parser.add_argument("--force", "-f", action="store_true", help="Force la récupération même si la liste est récente.")
+    parser.add_argument("--pretty", action="store_true", help="JSON indenté (compact par défaut).")
+    parser.add_argument("--all", action="store_true", help="Récupère les listes de tous les départements (requêtes concurrentes).")
+    parser.add_argument("--concurrency", type=int, default=16, help="Requêtes simultanées avec --all (défaut: 16).")
     args = parser.parse_args()
 
     if not args.api_key:
@@ -43,24 +154,70 @@ def main():
     
     print("Clé chargée correctement depuis les variables d'environnement utilisateur.")
 
+    if args.all:
+        fetch_all_departements(args)
+        return
+
+    json_file = Path("departements") / f"{args.departement}.json"
+    json_file.parent.mkdir(parents=True, exist_ok=True)
+
+    meta = {} if args.force else load_meta(json_file, args.parametre)
+    if is_fresh(json_file, meta):
+        print(f"JSON récupéré il y a moins de 24h: {json_file} (utilisez --force pour forcer la récupération)")
+        return
+
     try:
-        data = call_api(args.api_key, args.departement, args.parametre, args.timeout)
-    except requests.HTTPError as e:
+        data = call_api(args.api_key, args.departement, args.parametre, args.timeout, meta)
+    except _http.HTTPError as e:
         print(f"Erreur HTTP: {e}", file=sys.stderr)
         sys.exit(3)
     except Exception as e:
         print(f"Erreur: {e}", file=sys.stderr)
         sys.exit(4)
 
-    json_file = Path("departements") / f"{args.departement}.json"
-    json_file.parent.mkdir(parents=True, exist_ok=True)
-    with open(json_file, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    print(f"JSON enregistré dans: {json_file}")
-    # print(json.dumps(data, ensure_ascii=False, indent=2))
+    save_list(json_file, data, meta, args.pretty)
+    # print(_jsonio.dumps(data, indent=True))
+
+def fetch_all_departements(args):
+    """
+    --all : listes de tous les départements en une seule vague de requêtes concurrentes.
+    Les listes récentes (moins de 24h) sont ignorées, sauf avec --force.
+    """
+    if aiohttp is None:
+        print("Le module 'aiohttp' est requis pour --all. Installez-le avec: pip install aiohttp", file=sys.stderr)
+        sys.exit(1)
+
+    out_dir = Path("departements")
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    metas = {}
+    for d in DEPARTEMENTS:
+        json_file = out_dir / f"{d}.json"
+        meta = {} if args.force else load_meta(json_file, args.parametre)
+        if is_fresh(json_file, meta):
+            continue
+        metas[d] = meta
+    if len(metas) < len(DEPARTEMENTS):
+        print(f"{len(DEPARTEMENTS) - len(metas)} département(s) récupéré(s) il y a moins de 24h (utilisez --force pour forcer la récupération)")
+
+    results = asyncio.run(fetch_all(args.api_key, metas, args.parametre, args.timeout, max(1, args.concurrency)))
+
+    errors = 0
+    for (d, meta), data in zip(metas.items(), results):
+        if isinstance(data, Exception):
+            print(f"Erreur pour le département {d}: {data}", file=sys.stderr)
+            errors += 1
+            continue
+        save_list(out_dir / f"{d}.json", data, meta, args.pretty)
+
+    if errors:
+        sys.exit(3)
 
 if __name__ == "__main__":
-    # Désactive l'avertissement InsecureRequestWarning
-    import urllib3
-    urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+    # Désactive l'avertissement InsecureRequestWarning (client requests)
+    try:
+        import urllib3
+        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+    except Exception:
+        pass
     main()
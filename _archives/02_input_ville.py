@@ -4,6 +4,7 @@
 """
 Géocoder une ville en France à partir de son nom et d'un numéro de département (ex: 19, 75, 2A).
 Utilise Nominatim (OpenStreetMap) via geopy, avec fallback par bounding box du département.
+Les résultats sont mis en cache (mémoire + disque via diskcache si installé, 30 jours dans ~/.cache/meteo).
 
 Exemples :
     python geocode_city_by_deptcode.py "Beaulieu-sur-Dordogne" --department 19
@@ -11,21 +12,129 @@ Exemples :
     python geocode_city_by_deptcode.py "Bastia" --department 2B
 """
 
+import os
 import sys
 import argparse
-from typing import Optional, Tuple, List
+import time
+import functools
+import threading
+from typing import Any, Callable, Optional, Tuple, List
 
+from geopy.adapters import RequestsAdapter
+from geopy.exc import GeocoderParseError
 from geopy.geocoders import Nominatim
-from geopy.extra.rate_limiter import RateLimiter
 
+import _jsonio
 
+try:
+    import diskcache
+except ImportError:
+    diskcache = None
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "meteo")
+CACHE_EXPIRE = 30 * 86400  # 30 jours : les coordonnées d'une ville ne changent pas
+GEOCODE_MIN_DELAY = 1.0  # politique d'usage Nominatim : 1 requête par seconde au plus
+
+
+@functools.lru_cache(maxsize=1)
+def _disk_cache():
+    return diskcache.Cache(CACHE_DIR) if diskcache is not None else None
+
+
+def _memoize(func):
+    """
+    Cache en mémoire (lru_cache) + sur disque (diskcache, si installé).
+    Seuls les résultats trouvés sont conservés sur disque : un échec (None) sera retenté au prochain lancement.
+    """
+    @functools.lru_cache(maxsize=256)
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        cache = _disk_cache()
+        key = (func.__name__, args, tuple(sorted(kwargs.items())))
+        if cache is not None:
+            result = cache.get(key)
+            if result is not None:
+                return result
+        result = func(*args, **kwargs)
+        if cache is not None and result is not None:
+            cache.set(key, result, expire=CACHE_EXPIRE)
+        return result
+    return wrapper
+
+
+def _geocode_first(geocode, queries: List[str], accept: Callable[[Any], bool] = bool, **kwargs) -> Any:
+    """
+    Essaie les variantes de requêtes dans l'ordre et retourne la première location retenue par 'accept(location)';
+    les variantes suivantes ne sont pas envoyées. Les requêtes sont espacées par l'adaptateur (GEOCODE_MIN_DELAY) :
+    pas d'envoi simultané, conformément à la politique d'usage de Nominatim.
+    Le résultat brut est retourné : seul le gagnant est ensuite converti par l'appelant.
+    """
+    for q in queries:
+        try:
+            loc = geocode(q, **kwargs)
+            if loc and accept(loc):
+                return loc
+        except Exception:
+            # La variante échoue : les suivantes peuvent encore aboutir
+            continue
+    return None
+
+
+def _has_bbox(d) -> bool:
+    return bool(getattr(d, "raw", None) and d.raw.get("boundingbox"))
+
+
+def _bbox_from_location(d) -> Tuple[float, float, float, float]:
+    bb = d.raw["boundingbox"]  # [S, N, W, E]
+    return (float(bb[2]), float(bb[0]), float(bb[3]), float(bb[1]))
+
+
+def _city_from_location(loc) -> Tuple[float, float, str]:
+    return (loc.latitude, loc.longitude, loc.raw.get("display_name", ""))
+
+
+class _JsonioRequestsAdapter(RequestsAdapter):
+    """
+    RequestsAdapter dont les réponses sont décodées par _jsonio (orjson si installé)
+    directement depuis les octets, sans passer par resp.json().
+    Toutes les requêtes du processus passent par un même intervalle minimal (GEOCODE_MIN_DELAY),
+    quels que soient l'appelant et l'instance (attributs de classe).
+    """
+    _lock = threading.Lock()
+    _last_request = 0.0
+
+    def get_json(self, url, *, timeout, headers):
+        cls = type(self)
+        with cls._lock:
+            wait = cls._last_request + GEOCODE_MIN_DELAY - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            cls._last_request = time.monotonic()
+        resp = self._request(url, timeout=timeout, headers=headers)
+        try:
+            return _jsonio.loads(resp.content)
+        except ValueError:
+            raise GeocoderParseError(
+                "Could not deserialize using deserializer:\n%s" % resp.text
+            )
+
+
+@functools.lru_cache(maxsize=1)
 def _make_geocoder():
+    # Une seule instance par processus : une seule requests.Session (connexions réutilisées)
+    # et un seul intervalle entre requêtes (dans l'adaptateur), dont l'horloge n'est pas remise à zéro à chaque appel.
     # Nominatim exige un user_agent explicite et identifiable
-    geolocator = Nominatim(user_agent="m365copilot-geocoder-demo")
-    geocode = RateLimiter(geolocator.geocode, min_delay_seconds=1)  # respect du service
+    geolocator = Nominatim(
+        user_agent="m365copilot-geocoder-demo",
+        adapter_factory=lambda proxies, ssl_context: _JsonioRequestsAdapter(
+            proxies=proxies, ssl_context=ssl_context, pool_connections=4, pool_maxsize=8
+        ),
+    )
+    geocode = geolocator.geocode  # respect du service : requêtes espacées par _JsonioRequestsAdapter
     return geolocator, geocode
 
 
+@_memoize
 def _try_geocode_department_bbox(
     department_code: str,
     country: str = "France",
@@ -35,7 +144,7 @@ def _try_geocode_department_bbox(
     Géocode le département à partir de son code (ex: '19', '2A') et retourne sa bounding box (west, south, east, north).
     On tente plusieurs formulations pour Nominatim.
     """
-    _, geocode = _make_geocoder()
+    geolocator, _ = _make_geocoder()
 
     # Variantes de requêtes pour maximiser les chances de trouver le département par code
     queries: List[str] = [
@@ -46,18 +155,13 @@ def _try_geocode_department_bbox(
         f"{department_code}, {country} département",
     ]
 
-    for q in queries:
-        try:
-            d = geocode(q, language=language, addressdetails=True, country_codes="fr", exactly_one=True)
-            if d and getattr(d, "raw", None) and d.raw.get("boundingbox"):
-                south, north, west, east = map(float, d.raw["boundingbox"])  # [S, N, W, E]
-                return (west, south, east, north)
-        except Exception:
-            # On poursuit avec la prochaine variante
-            continue
-    return None
+    # Variantes essayées dans l'ordre : le premier résultat avec bounding box l'emporte
+    loc = _geocode_first(geolocator.geocode, queries, _has_bbox,
+                         language=language, addressdetails=True, country_codes="fr", exactly_one=True)
+    return _bbox_from_location(loc) if loc else None
 
 
+@_memoize
 def geocode_city_with_department_code(
     city: str,
     department_code: str,
@@ -80,13 +184,11 @@ def geocode_city_with_department_code(
         f"{city}, Department {department_code}, {country}",
         f"{city}, {department_code}, {country}",
     ]
-    for q in direct_queries:
-        try:
-            loc = geocode(q, language=language, addressdetails=True, country_codes="fr", exactly_one=True)
-            if loc:
-                return (loc.latitude, loc.longitude, loc.raw.get("display_name", ""))
-        except Exception:
-            continue
+    # Variantes essayées dans l'ordre : le premier résultat l'emporte
+    loc = _geocode_first(geolocator.geocode, direct_queries,
+                         language=language, addressdetails=True, country_codes="fr", exactly_one=True)
+    if loc is not None:
+        return _city_from_location(loc)
 
     # 2) Fallback : borner la recherche au département (via sa bbox)
     bbox = _try_geocode_department_bbox(department_code, country=country, language=language)
@@ -105,7 +207,7 @@ def geocode_city_with_department_code(
                 limit=1,
             )
             if loc:
-                return (loc.latitude, loc.longitude, loc.raw.get("display_name", ""))
+                return _city_from_location(loc)
         except Exception:
             pass
 
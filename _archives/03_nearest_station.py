@@ -11,10 +11,29 @@ Usage 2 (sans fichier, en dur dans le script) :
     python nearest_station.py --lat 47.321189 --lon -0.332695
 """
 
-import json
+import sys
 import math
+import pickle
 import argparse
-from typing import List, Dict, Any, Tuple, Optional
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, List, Dict, Any, Tuple, Optional
+
+try:
+    import numpy as np
+except ImportError:
+    print("Le module 'numpy' est requis. Installez-le avec: pip install numpy", file=sys.stderr)
+    sys.exit(1)
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None  # recherche par fenêtres de latitude
+
+import _jsonio
+
+R_EARTH_KM = 6371.0088  # rayon moyen de la Terre (km)
+LAT_WINDOWS_DEG = (1.0, 5.0)  # fenêtres de latitude essayées avant de parcourir toutes les stations
 
 # Exemple de données si vous ne passez pas de fichier.
 # Remplacez/complétez si besoin.
@@ -56,7 +75,6 @@ def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     """
     Distance grand cercle (Haversine) entre deux points (en km).
     """
-    R = 6371.0088  # rayon moyen de la Terre (km)
     phi1 = math.radians(lat1)
     phi2 = math.radians(lat2)
     dphi = math.radians(lat2 - lat1)
@@ -64,41 +82,213 @@ def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
 
     a = math.sin(dphi/2)**2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda/2)**2
     c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    return R * c
+    return R_EARTH_KM * c
+
+
+@dataclass
+class Stations:
+    """
+    Catalogue de stations en colonnes (SoA) : les calculs ne lisent que les tableaux de flottants,
+    les dictionnaires d'origine ne servent qu'au résultat (indice -> record).
+    Seules les stations ayant des champs 'lat' et 'lon' numériques sont conservées,
+    triées par latitude croissante (recherche par fenêtre avec np.searchsorted).
+    """
+    lats: np.ndarray        # float64
+    lons: np.ndarray        # float64
+    open_: np.ndarray       # bool ('posteOuvert')
+    records: List[Dict[str, Any]]  # dictionnaires d'origine, pour la sortie JSON
+    tree: Any = field(default=None, repr=False)                    # cKDTree (ECEF) des stations ouvertes
+    tree_idx: Optional[np.ndarray] = field(default=None, repr=False)  # noeud du tree -> indice de station
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict[str, Any]]) -> "Stations":
+        """
+        Remplit les colonnes en une seule passe sur la liste de dictionnaires, puis les trie par latitude.
+        """
+        kept: List[Dict[str, Any]] = []
+        lats: List[float] = []
+        lons: List[float] = []
+        for st in records:
+            if not isinstance(st, dict):
+                continue
+            try:
+                lat = float(st["lat"])
+                lon = float(st["lon"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            lats.append(lat)
+            lons.append(lon)
+            kept.append(st)
+
+        order = np.argsort(np.array(lats, dtype=np.float64), kind="stable")
+        kept = [kept[i] for i in order]
+        return cls(
+            lats=np.array(lats, dtype=np.float64)[order],
+            lons=np.array(lons, dtype=np.float64)[order],
+            open_=np.array([bool(st.get("posteOuvert")) for st in kept], dtype=bool),
+            records=kept,
+        )
+
+    def __len__(self) -> int:
+        return self.lats.size
+
+    def record(self, i: int) -> Dict[str, Any]:
+        return self.records[i]
+
+    def build_tree(self):
+        """
+        Construit le cKDTree des stations ouvertes en coordonnées ECEF (x, y, z).
+        La distance euclidienne 3D (corde) est monotone avec la distance grand cercle :
+        chaque requête devient O(log N) et reste exacte.
+        """
+        self.tree_idx = np.flatnonzero(self.open_)
+        self.tree = cKDTree(_ecef(self.lats[self.tree_idx], self.lons[self.tree_idx]))
+
+
+def _ecef(lats, lons) -> np.ndarray:
+    phi = np.radians(lats)
+    lam = np.radians(lons)
+    cos_phi = np.cos(phi)
+    return R_EARTH_KM * np.column_stack((cos_phi * np.cos(lam), cos_phi * np.sin(lam), np.sin(phi)))
+
+
+def _tree_query(city_lat: float, city_lon: float, stations: Stations, top_n: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Retourne (indices, distances_km) des 'top_n' plus proches via le cKDTree.
+    """
+    top_n = min(top_n, stations.tree_idx.size)
+    if top_n == 0:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float64)
+    chord, idx = stations.tree.query(_ecef(city_lat, city_lon)[0], k=top_n)
+    chord = np.atleast_1d(chord)
+    idx = np.atleast_1d(idx)
+    # corde -> arc : d = 2R·asin(corde / 2R)
+    d = 2 * R_EARTH_KM * np.arcsin(np.minimum(chord / (2 * R_EARTH_KM), 1.0))
+    return stations.tree_idx[idx], d
+
+
+def _proj_sqdist(cos0: float, lat, lon, lat0: float, lon0: float):
+    """
+    Distance au carré (en degrés²) en projection équirectangulaire autour de (lat0, lon0).
+    Monotone avec la distance réelle à l'échelle d'un département : suffit pour un argmin.
+    """
+    dy = lat - lat0
+    dx = (lon - lon0) * cos0
+    return dx*dx + dy*dy
+
+
+def _lat_windows(stations: Stations, city_lat: float):
+    """
+    Génère (indices_stations_ouvertes, borne_km) pour des fenêtres de latitude croissantes autour de la ville
+    (O(log N) via np.searchsorted), puis pour toutes les stations (borne infinie).
+    Toute station hors d'une fenêtre ±delta est à plus de 'borne_km' = R·delta de la ville :
+    un résultat de la fenêtre ne dépassant pas cette borne est donc exact.
+    """
+    for delta in LAT_WINDOWS_DEG:
+        lo = int(np.searchsorted(stations.lats, city_lat - delta, side="left"))
+        hi = int(np.searchsorted(stations.lats, city_lat + delta, side="right"))
+        yield lo + np.flatnonzero(stations.open_[lo:hi]), R_EARTH_KM * math.radians(delta)
+    yield np.flatnonzero(stations.open_), math.inf
+
+
+def _haversine_top(city_lat: float, city_lon: float, lats: np.ndarray, lons: np.ndarray, top_n: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Haversine vectorisée; retourne (indices, distances_km) des 'top_n' plus proches, par distance croissante.
+    """
+    if lats.size == 0:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float64)
+
+    phi1 = np.radians(city_lat)
+    phi2 = np.radians(lats)
+    dphi = phi2 - phi1
+    dlambda = np.radians(lons - city_lon)
+
+    a = np.sin(dphi/2)**2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlambda/2)**2
+    d = 2 * R_EARTH_KM * np.arcsin(np.sqrt(a))
+
+    top_n = min(top_n, d.size)
+    idx = np.argpartition(d, top_n - 1)[:top_n]
+    idx = idx[np.argsort(d[idx])]
+    return idx, d[idx]
+
+
+def nearest_stations(
+    city_lat: float,
+    city_lon: float,
+    stations: Stations,
+    top_n: int = 1
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Retourne (indices, distances_km) des 'top_n' stations ouvertes les plus proches, par distance croissante.
+    Les indices se rapportent à 'stations'.
+    """
+    if stations.tree is not None:
+        return _tree_query(city_lat, city_lon, stations, top_n)
+
+    for cand, bound_km in _lat_windows(stations, city_lat):
+        if cand.size < top_n and bound_km != math.inf:
+            continue
+        idx, d = _haversine_top(city_lat, city_lon, stations.lats[cand], stations.lons[cand], top_n)
+        if bound_km == math.inf or d[-1] <= bound_km:
+            return cand[idx], d
 
 
 def find_nearest_station(
     city_lat: float,
     city_lon: float,
-    stations: List[Dict[str, Any]]
+    stations: Stations
 ) -> Tuple[Optional[Dict[str, Any]], Optional[float]]:
     """
-    Retourne (station_la_plus_proche, distance_km). Si aucune station valide n'est trouvée, (None, None).
-    Une station est considérée valide si elle possède des champs 'lat' et 'lon' numériques.
+    Retourne (station_la_plus_proche, distance_km). Si aucune station ouverte n'est trouvée, (None, None).
     """
-    nearest: Optional[Dict[str, Any]] = None
-    best_dist: Optional[float] = None
+    if stations.tree is not None:
+        idx, d = _tree_query(city_lat, city_lon, stations, 1)
+        if idx.size == 0:
+            return None, None
+        return stations.record(int(idx[0])), float(d[0])
 
-    for st in stations:
-        if not st['posteOuvert']:
-            continue
-        try:
-            slat = float(st["lat"])
-            slon = float(st["lon"])
-        except (KeyError, TypeError, ValueError):
+    # Sélection sur la projection équirectangulaire, Haversine uniquement pour la gagnante
+    cos0 = math.cos(math.radians(city_lat))
+    for cand, bound_km in _lat_windows(stations, city_lat):
+        if cand.size == 0:
             continue
+        sq = _proj_sqdist(cos0, stations.lats[cand], stations.lons[cand], city_lat, city_lon)
+        i = int(cand[np.argmin(sq)])
+        d = haversine_km(city_lat, city_lon, stations.lats[i], stations.lons[i])
+        if d <= bound_km:
+            return stations.record(i), d
+    return None, None
 
-        d = haversine_km(city_lat, city_lon, slat, slon)
-        if best_dist is None or d < best_dist:
-            best_dist = d
-            nearest = st
 
-    return nearest, best_dist
+def load_stations_from_file(path: str) -> Stations:
+    """
+    Charge le catalogue; si scipy est installé, y associe le cKDTree, mis en cache
+    dans '<fichier>.kdtree.pkl' tant que le fichier JSON garde la même taille et la même date (ns).
+    """
+    json_path = Path(path)
+    st = json_path.stat()  # avant la lecture : un fichier réécrit entre-temps invalidera le cache
+    signature = (st.st_size, st.st_mtime_ns)
+    stations = Stations.from_records(_jsonio.loads(json_path.read_bytes()))
+    if cKDTree is None:
+        return stations
 
+    tree_path = json_path.with_name(json_path.name + ".kdtree.pkl")
+    try:
+        with tree_path.open("rb") as f:
+            cached_signature, tree, tree_idx = pickle.load(f)
+        if cached_signature == signature:
+            stations.tree, stations.tree_idx = tree, tree_idx
+            return stations
+    except Exception:
+        pass  # cache absent, d'un ancien format ou illisible (mise à jour de scipy/numpy...) : reconstruit
 
-def load_stations_from_file(path: str) -> List[Dict[str, Any]]:
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    stations.build_tree()
+    try:
+        with tree_path.open("wb") as f:
+            pickle.dump((signature, stations.tree, stations.tree_idx), f, protocol=pickle.HIGHEST_PROTOCOL)
+    except OSError:
+        pass  # cache facultatif (répertoire en lecture seule...)
+    return stations
 
 
 def main():
@@ -113,39 +303,24 @@ def main():
     if args.json_file:
         stations = load_stations_from_file(args.json_file)
     else:
-        stations = STATIONS_JSON
+        stations = Stations.from_records(STATIONS_JSON)
 
-    # Nettoyage minimal : conserver uniquement celles ayant lat/lon
-    stations = [s for s in stations if isinstance(s, dict) and "lat" in s and "lon" in s]
-
-    if not stations:
-        print("Aucune station valide (avec lat/lon) n'a été trouvée.")
+    if not stations.open_.any():
+        print("Aucune station valide (ouverte, avec lat/lon) n'a été trouvée.")
         return
 
-    # Tri par distance croissante
-    stations_with_dist = []
-    for s in stations:
-        if not s['posteOuvert']:
-            continue
-        d = haversine_km(args.lat, args.lon, float(s["lat"]), float(s["lon"]))
-        stations_with_dist.append((s, d))
-    stations_with_dist.sort(key=lambda x: x[1])
-
-    # Affiche la meilleure (ou le top-N demandé)
+    # Affiche la meilleure (ou le top-N demandé), par distance croissante
     top_n = max(1, args.top)
-    best = stations_with_dist[:top_n]
+    idx, dist = nearest_stations(args.lat, args.lon, stations, top_n)
+    best = [(stations.record(i), float(d)) for i, d in zip(idx, dist)]
 
     if top_n == 1:
         station, dist_km = best[0]
-        print(json.dumps(station, ensure_ascii=False, indent=2))
+        print(_jsonio.dumps(station, indent=True))
         print(f"Distance_km: {dist_km:.3f}")
     else:
-        result = []
-        for s, d in best:
-            out = dict(s)
-            out["_distance_km"] = round(d, 3)
-            result.append(out)
-        print(json.dumps(result, ensure_ascii=False, indent=2))
+        # Stations gardées par référence dans 'best'; la distance n'est ajoutée qu'à la sérialisation
+        print(_jsonio.dumps([{**s, "_distance_km": round(d, 3)} for s, d in best], indent=True))
 
 
 if __name__ == "__main__":
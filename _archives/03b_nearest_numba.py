@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Variante de 03_nearest_station.py pour les traitements par lot (plusieurs villes × beaucoup de stations) :
+le calcul Haversine est compilé avec Numba (LLVM, boucles parallèles, trigonométrie vectorisée).
+Les stations sont converties une seule fois en tableaux NumPy, réutilisés pour toutes les villes.
+La première exécution compile le noyau; les suivantes réutilisent le cache sur disque (cache=True).
+
+Usage :
+    python 03b_nearest_numba.py --json-file ../departements/49.json --city 47.321189 -0.332695 --city 47.47 -0.55
+"""
+
+import sys
+import math
+import argparse
+from pathlib import Path
+from typing import List, Dict, Any, Tuple
+
+try:
+    import numpy as np
+    from numba import njit, prange
+except ImportError:
+    print("Les modules 'numpy' et 'numba' sont requis. Installez-les avec: pip install numpy numba", file=sys.stderr)
+    sys.exit(1)
+
+import _jsonio
+
+R_EARTH_KM = 6371.0088  # rayon moyen de la Terre (km)
+
+# fastmath sans 'ninf'/'nnan' : np.inf sert de sentinelle "aucune station"
+FASTMATH = {"nsz", "arcp", "contract", "afn", "reassoc"}
+
+
+@njit(cache=True, fastmath=FASTMATH, inline="always")
+def _haversine(lat1, lon1, lat2, lon2):
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi/2)**2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda/2)**2
+    return 2 * R_EARTH_KM * math.asin(math.sqrt(a))
+
+
+@njit(parallel=True, fastmath=FASTMATH, cache=True)
+def nearest(city_lat, city_lon, lats, lons, open_mask):
+    """
+    Retourne (indice, distance_km) de la station ouverte la plus proche; (-1, inf) si aucune.
+    Les distances sont calculées en parallèle, l'argmin est fait ensuite (pas de course entre threads).
+    """
+    d = np.empty(lats.size)
+    for i in prange(lats.size):
+        if open_mask[i]:
+            d[i] = _haversine(city_lat, city_lon, lats[i], lons[i])
+        else:
+            d[i] = np.inf
+    if d.size == 0:
+        return -1, np.inf
+    bi = np.argmin(d)
+    if d[bi] == np.inf:
+        return -1, np.inf
+    return bi, d[bi]
+
+
+@njit(parallel=True, fastmath=FASTMATH, cache=True)
+def nearest_batch(city_lats, city_lons, lats, lons, open_mask):
+    """
+    Version par lot : une ville par itération parallèle.
+    Retourne (indices, distances_km); indice -1 si aucune station ouverte.
+    """
+    n = city_lats.size
+    best_idx = np.full(n, -1, dtype=np.int64)
+    best_dist = np.full(n, np.inf)
+    for c in prange(n):
+        for i in range(lats.size):
+            if not open_mask[i]:
+                continue
+            d = _haversine(city_lats[c], city_lons[c], lats[i], lons[i])
+            if d < best_dist[c]:
+                best_dist[c] = d
+                best_idx[c] = i
+    return best_idx, best_dist
+
+
+def stations_to_arrays(stations: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Conversion unique en tableaux (SoA) : (stations_valides, lats, lons, open_mask).
+    Les stations sans 'lat'/'lon' numériques sont écartées.
+    """
+    valid: List[Dict[str, Any]] = []
+    rows: List[Tuple[float, float, bool]] = []
+    for st in stations:
+        try:
+            rows.append((float(st["lat"]), float(st["lon"]), bool(st.get("posteOuvert"))))
+        except (KeyError, TypeError, ValueError):
+            continue
+        valid.append(st)
+
+    arr = np.array(rows, dtype=np.float64).reshape(-1, 3)
+    lats = np.ascontiguousarray(arr[:, 0])
+    lons = np.ascontiguousarray(arr[:, 1])
+    open_mask = arr[:, 2].astype(np.bool_)
+    return valid, lats, lons, open_mask
+
+
+def load_stations_from_file(path: str) -> List[Dict[str, Any]]:
+    return _jsonio.loads(Path(path).read_bytes())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Trouve la station météo la plus proche de plusieurs positions (Numba).")
+    parser.add_argument("--json-file", type=str, required=True, help="Chemin du fichier JSON des stations.")
+    parser.add_argument("--city", type=float, nargs=2, action="append", required=True, metavar=("LAT", "LON"),
+                        help="Position d'une ville (répétable, ex: --city 47.321189 -0.332695).")
+
+    args = parser.parse_args()
+
+    stations, lats, lons, open_mask = stations_to_arrays(load_stations_from_file(args.json_file))
+
+    city_lats = np.array([c[0] for c in args.city], dtype=np.float64)
+    city_lons = np.array([c[1] for c in args.city], dtype=np.float64)
+    if city_lats.size == 1:
+        # Une seule ville : parallélisme sur les stations (nearest_batch n'aurait qu'une itération parallèle)
+        i, d = nearest(city_lats[0], city_lons[0], lats, lons, open_mask)
+        idx, dist = np.array([i]), np.array([d])
+    else:
+        idx, dist = nearest_batch(city_lats, city_lons, lats, lons, open_mask)
+
+    result = []
+    for (lat, lon), i, d in zip(args.city, idx, dist):
+        if i < 0:
+            print(f"Aucune station ouverte trouvée pour ({lat}, {lon}).", file=sys.stderr)
+            continue
+        result.append({"lat": lat, "lon": lon, "station": stations[i], "_distance_km": round(float(d), 3)})
+    print(_jsonio.dumps(result, indent=True))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Variante asynchrone de 04_meteofrance_commande_station.py : envoie les commandes
+DPClim 'commande-station/quotidienne' pour plusieurs stations en parallèle.
+
+Exemples:
+  python 04_async.py --id-station 49191001 49007011 85146001 --date-deb 2025-12-21 --date-fin 2025-12-22
+
+  # Limiter le nombre de requêtes simultanées
+  python 04_async.py --id-station 49191001 49007011 --date-deb 2025-12-21 --date-fin 2025-12-22 --concurrency 5
+"""
+
+import os
+import sys
+import asyncio
+import re
+import argparse
+from datetime import datetime
+from typing import Dict, Any, List, Tuple
+
+try:
+    import aiohttp
+except ImportError:
+    print("Le module 'aiohttp' est requis. Installez-le avec: pip install aiohttp", file=sys.stderr)
+    sys.exit(1)
+
+import _jsonio
+
+API_BASE_URL = "https://public-api.meteofrance.fr/public/DPClim/v1"
+ENDPOINT = "commande-station/quotidienne"
+_DATE_RE = re.compile(r"(\d{4})-(\d{2})-(\d{2})", re.ASCII)
+
+
+def to_iso_midnight_z(date_str: str) -> str:
+    """
+    Convertit une date 'AAAA-MM-DD' en 'YYYY-MM-DDT00:00:00Z'.
+    Valide le format d'entrée; lève ValueError si invalide.
+    """
+    # Expression régulière + constructeur datetime (jour/mois réels) : bien plus rapide que strptime
+    m = _DATE_RE.fullmatch(date_str)
+    try:
+        if m is None:
+            raise ValueError
+        datetime(int(m[1]), int(m[2]), int(m[3]))
+    except ValueError as e:
+        raise ValueError(f"Date invalide '{date_str}'. Attendu: AAAA-MM-DD.") from e
+    return f"{date_str}T00:00:00Z"
+
+
+async def fetch_one(session: "aiohttp.ClientSession", sem: asyncio.Semaphore, id_station: str, params: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Envoie la commande pour une station (au plus 'sem' requêtes simultanées).
+    """
+    async with sem:
+        async with session.get(f"{API_BASE_URL}/{ENDPOINT}", params={"id-station": id_station, **params}) as r:
+            r.raise_for_status()
+            return await r.json(loads=_jsonio.loads, content_type=None)
+
+
+async def fetch_all(api_key: str, stations: List[str], dates: Tuple[str, str], timeout: float = 15.0,
+                    verify_ssl: bool = False, concurrency: int = 10) -> List[Any]:
+    """
+    Envoie les commandes de toutes les stations sur une seule ClientSession.
+    Retourne une liste alignée sur 'stations' : réponse JSON ou exception.
+    """
+    date_deb, date_fin = dates
+    params = {
+        "date-deb-periode": to_iso_midnight_z(date_deb),
+        "date-fin-periode": to_iso_midnight_z(date_fin),
+    }
+    sem = asyncio.Semaphore(concurrency)
+    connector = aiohttp.TCPConnector(limit=32, ssl=verify_ssl)
+    headers = {
+        "accept": "*/*",
+        "apikey": api_key,
+    }
+    # trust_env : proxies pris des variables d'environnement si présents
+    async with aiohttp.ClientSession(connector=connector, headers=headers, trust_env=True,
+                                     timeout=aiohttp.ClientTimeout(sock_connect=timeout, sock_read=timeout)) as session:
+        return await asyncio.gather(
+            *(fetch_one(session, sem, s, params) for s in stations),
+            return_exceptions=True,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Exécute en parallèle des requêtes DPClim 'commande-station/quotidienne' pour plusieurs stations."
+    )
+    parser.add_argument("--api-key", default=os.environ.get("METEOFRANCE_API_KEY"),
+                        help="Clé API Météo-France (ou via METEOFRANCE_API_KEY).")
+    parser.add_argument("--id-station", nargs="+", required=True, help="Identifiants de stations (ex: 49191001 49007011).")
+    parser.add_argument("--date-deb", required=True, help="Début de période au format AAAA-MM-DD.")
+    parser.add_argument("--date-fin", required=True, help="Fin de période au format AAAA-MM-DD.")
+    parser.add_argument("--timeout", type=float, default=15.0, help="Timeout de la requête en secondes (défaut: 15).")
+    parser.add_argument("--concurrency", type=int, default=10, help="Nombre maximal de requêtes simultanées (défaut: 10).")
+    parser.add_argument("--insecure", action="store_true", help="Désactive la vérification SSL (non sécurisé).")
+
+    args = parser.parse_args()
+
+    if not args.api_key:
+        print("Erreur: aucune clé API fournie. Passez --api-key ou définissez METEOFRANCE_API_KEY.", file=sys.stderr)
+        sys.exit(2)
+
+    # Validation simple des dates
+    for label, d in (("date-deb", args.date_deb), ("date-fin", args.date_fin)):
+        try:
+            to_iso_midnight_z(d)
+        except ValueError:
+            print(f"Erreur: {label} invalide '{d}'. Format attendu: AAAA-MM-DD.", file=sys.stderr)
+            sys.exit(2)
+
+    if args.date_deb > args.date_fin:
+        print("Erreur: date-deb doit être antérieure ou égale à date-fin.", file=sys.stderr)
+        sys.exit(2)
+
+    results = asyncio.run(fetch_all(
+        api_key=args.api_key,
+        stations=args.id_station,
+        dates=(args.date_deb, args.date_fin),
+        timeout=args.timeout,
+        verify_ssl=not args.insecure,
+        concurrency=max(1, args.concurrency),
+    ))
+
+    errors = 0
+    output = {}
+    for id_station, data in zip(args.id_station, results):
+        if isinstance(data, Exception):
+            print(f"Erreur pour la station {id_station}: {data}", file=sys.stderr)
+            errors += 1
+            continue
+        output[id_station] = data
+
+    # Affiche les réponses JSON par station
+    print(_jsonio.dumps(output, indent=True))
+
+    if errors:
+        sys.exit(3)
+
+
+if __name__ == "__main__":
+    main()
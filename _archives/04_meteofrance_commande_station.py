@@ -22,19 +22,22 @@ Exemples:
 
 import os
 import sys
-import json
+import re
 import argparse
 from datetime import datetime
 from typing import Dict, Any
 
 try:
-    import requests
+    import _http
 except ImportError:
-    print("Le module 'requests' est requis. Installez-le avec: pip install requests", file=sys.stderr)
+    print("Le module 'httpx' ou 'requests' est requis. Installez-le avec: pip install httpx", file=sys.stderr)
     sys.exit(1)
 
+import _jsonio
+
 API_BASE_URL = "https://public-api.meteofrance.fr/public/DPClim/v1"
 ENDPOINT = "commande-station/quotidienne"
+_DATE_RE = re.compile(r"(\d{4})-(\d{2})-(\d{2})", re.ASCII)
 
 
 def to_iso_midnight_z(date_str: str) -> str:
@@ -42,11 +45,15 @@ def to_iso_midnight_z(date_str: str) -> str:
     Convertit une date 'AAAA-MM-DD' en 'YYYY-MM-DDT00:00:00Z'.
     Valide le format d'entrée; lève ValueError si invalide.
     """
+    # Expression régulière + constructeur datetime (jour/mois réels) : bien plus rapide que strptime
+    m = _DATE_RE.fullmatch(date_str)
     try:
-        dt = datetime.strptime(date_str, "%Y-%m-%d")
+        if m is None:
+            raise ValueError
+        datetime(int(m[1]), int(m[2]), int(m[3]))
     except ValueError as e:
         raise ValueError(f"Date invalide '{date_str}'. Attendu: AAAA-MM-DD.") from e
-    return dt.strftime("%Y-%m-%dT00:00:00Z")
+    return f"{date_str}T00:00:00Z"
 
 
 def call_api(api_key: str, id_station: str, date_deb: str, date_fin: str, timeout: float = 10.0, verify_ssl: bool = False) -> Dict[str, Any]:
@@ -54,10 +61,6 @@ def call_api(api_key: str, id_station: str, date_deb: str, date_fin: str, timeou
     Appelle l'API DPClim et retourne le JSON.
     """
     url = f"{API_BASE_URL}/{ENDPOINT}"
-    headers = {
-        "accept": "*/*",
-        "apikey": api_key,
-    }
     params = {
         "id-station": id_station,
         "date-deb-periode": to_iso_midnight_z(date_deb),
@@ -70,12 +73,12 @@ def call_api(api_key: str, id_station: str, date_deb: str, date_fin: str, timeou
         "https": os.environ.get("HTTPS_PROXY"),
     }
 
-    resp = requests.get(url, headers=headers, params=params, timeout=timeout, proxies=proxies, verify=verify_ssl)
+    resp = _http.get(api_key, url, params=params, timeout=timeout, proxies=proxies, verify=verify_ssl)
     resp.raise_for_status()
 
     try:
-        return resp.json()
-    except json.JSONDecodeError:
+        return _jsonio.loads(resp.content)
+    except _jsonio.JSONDecodeError:
         raise ValueError("La réponse n'est pas un JSON valide.")
 
 
@@ -91,6 +94,7 @@ def main():
     parser.add_argument("--timeout", type=float, default=15.0, help="Timeout de la requête en secondes (défaut: 15).")
     parser.add_argument("--output", default=None, help="Chemin de sortie pour enregistrer le JSON (optionnel).")
     parser.add_argument("--insecure", action="store_true", help="Désactive la vérification SSL (non sécurisé).")
+    parser.add_argument("--pretty", action="store_true", help="JSON indenté dans le fichier de sortie (compact par défaut).")
 
     args = parser.parse_args()
 
@@ -101,12 +105,12 @@ def main():
     # Validation simple des dates (et conversion se fait dans call_api)
     for label, d in (("date-deb", args.date_deb), ("date-fin", args.date_fin)):
         try:
-            datetime.strptime(d, "%Y-%m-%d")
+            to_iso_midnight_z(d)
         except ValueError:
             print(f"Erreur: {label} invalide '{d}'. Format attendu: AAAA-MM-DD.", file=sys.stderr)
             sys.exit(2)
 
-    # Optionnel: vérifier que date_deb <= date_fin
+    # Optionnel: vérifier que date_deb <= date_fin (ordre lexical = ordre chronologique en AAAA-MM-DD)
     if args.date_deb > args.date_fin:
         print("Erreur: date-deb doit être antérieure ou égale à date-fin.", file=sys.stderr)
         sys.exit(2)
@@ -130,28 +134,28 @@ def main():
             timeout=args.timeout,
             verify_ssl=verify_ssl,
         )
-    except requests.SSLError as e:
+    except _http.SSLError as e:
         print("Erreur SSL/TLS lors de la vérification du certificat.", file=sys.stderr)
         print(f"Détails: {e}", file=sys.stderr)
         print("Astuce: réexécutez avec --insecure pour tester (non recommandé en production).", file=sys.stderr)
         sys.exit(6)
-    except requests.HTTPError as e:
+    except _http.HTTPError as e:
         status = e.response.status_code if e.response else "N/A"
         content = e.response.text if e.response else ""
         print(f"Erreur HTTP {status}: {e}\nContenu: {content}", file=sys.stderr)
         sys.exit(3)
-    except (requests.RequestException, ValueError) as e:
+    except (_http.RequestException, ValueError) as e:
         print(f"Erreur de requête: {e}", file=sys.stderr)
         sys.exit(4)
 
     # Affiche la réponse JSON
-    print(json.dumps(data, ensure_ascii=False, indent=2))
+    print(_jsonio.dumps(data, indent=True))
 
     # Enregistre si demandé
     if args.output:
         try:
             with open(args.output, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+                f.write(_jsonio.dumps(data, indent=args.pretty))
             print(f"JSON enregistré dans: {args.output}")
         except OSError as e:
             print(f"Impossible d'écrire le fichier '{args.output}': {e}", file=sys.stderr)
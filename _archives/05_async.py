@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Variante asynchrone de 05_meteofrance_get_file.py : télécharge en parallèle les fichiers
+de plusieurs commandes DPClim. Chaque fichier est écrit sur disque au fil de la réception.
+
+Exemples :
+    python 05_async.py --id-cmde 2025023633107 2025023633108 --output-dir fichiers
+
+    # Limiter le nombre de téléchargements simultanés
+    python 05_async.py --id-cmde 2025023633107 2025023633108 --output-dir fichiers --concurrency 5
+"""
+
+import os
+import sys
+import asyncio
+import argparse
+from pathlib import Path
+from typing import List, Optional
+
+try:
+    import aiohttp
+except ImportError:
+    print("Le module 'aiohttp' est requis. Installez-le avec: pip install aiohttp", file=sys.stderr)
+    sys.exit(1)
+
+API_BASE_URL = "https://public-api.meteofrance.fr/public/DPClim/v1"
+ENDPOINT = "commande/fichier"
+CHUNK_SIZE = 64 * 1024
+
+
+async def download_one(session: "aiohttp.ClientSession", sem: asyncio.Semaphore, id_cmde: str, output_path: Path) -> Path:
+    """
+    Télécharge le fichier d'une commande (au plus 'sem' téléchargements simultanés).
+    """
+    async with sem:
+        async with session.get(f"{API_BASE_URL}/{ENDPOINT}", params={"id-cmde": id_cmde}) as r:
+            r.raise_for_status()
+            with open(output_path, "wb") as f:
+                async for chunk in r.content.iter_chunked(CHUNK_SIZE):
+                    f.write(chunk)
+    return output_path
+
+
+async def download_all(api_key: str, commandes: List[str], output_dir: Path, timeout: Optional[float] = 30.0,
+                       verify_ssl: bool = False, concurrency: int = 10) -> List[object]:
+    """
+    Télécharge les fichiers de toutes les commandes sur une seule ClientSession.
+    Retourne une liste alignée sur 'commandes' : chemin du fichier ou exception.
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    sem = asyncio.Semaphore(concurrency)
+    connector = aiohttp.TCPConnector(limit=32, ssl=verify_ssl)
+    headers = {
+        "accept": "*/*",
+        "apikey": api_key,
+    }
+    # trust_env : proxies pris des variables d'environnement si présents
+    async with aiohttp.ClientSession(connector=connector, headers=headers, trust_env=True,
+                                     timeout=aiohttp.ClientTimeout(sock_connect=timeout, sock_read=timeout)) as session:
+        return await asyncio.gather(
+            *(download_one(session, sem, c, output_dir / f"{c}.csv") for c in commandes),
+            return_exceptions=True,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Télécharge en parallèle les fichiers de commandes DPClim (Météo-France).")
+    parser.add_argument("--api-key", default=os.environ.get("METEOFRANCE_API_KEY"),
+                        help="Clé API Météo-France (ou via METEOFRANCE_API_KEY).")
+    parser.add_argument("--id-cmde", nargs="+", required=True, help="Identifiants de commande (ex: 2025023633107).")
+    parser.add_argument("--output-dir", default=".", help="Répertoire de sortie; un fichier '<id-cmde>.csv' par commande.")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Timeout en secondes (défaut: 30).")
+    parser.add_argument("--concurrency", type=int, default=10, help="Nombre maximal de téléchargements simultanés (défaut: 10).")
+    parser.add_argument("--insecure", action="store_true", help="Désactive la vérification SSL (non sécurisé).")
+
+    args = parser.parse_args()
+
+    if not args.api_key:
+        print("Erreur: aucune clé API fournie. Passez --api-key ou définissez METEOFRANCE_API_KEY.", file=sys.stderr)
+        sys.exit(2)
+
+    results = asyncio.run(download_all(
+        api_key=args.api_key,
+        commandes=args.id_cmde,
+        output_dir=Path(args.output_dir),
+        timeout=args.timeout,
+        verify_ssl=not args.insecure,
+        concurrency=max(1, args.concurrency),
+    ))
+
+    errors = 0
+    for id_cmde, result in zip(args.id_cmde, results):
+        if isinstance(result, Exception):
+            print(f"Erreur pour la commande {id_cmde}: {result}", file=sys.stderr)
+            errors += 1
+        else:
+            print(f"Fichier téléchargé avec succès: {result}")
+
+    if errors:
+        sys.exit(3)
+
+
+if __name__ == "__main__":
+    main()
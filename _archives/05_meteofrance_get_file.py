@@ -19,7 +19,8 @@ Exemples :
 import os
 import sys
 import argparse
-import requests
+
+import _http
 
 API_BASE_URL = "https://public-api.meteofrance.fr/public/DPClim/v1"
 ENDPOINT = "commande/fichier"
@@ -30,10 +31,6 @@ def download_file(api_key: str, id_cmde: str, output_path: str, timeout: float,
     Télécharge le fichier associé à la commande DPClim.
     """
     url = f"{API_BASE_URL}/{ENDPOINT}"
-    headers = {
-        "accept": "*/*",
-        "apikey": api_key,
-    }
     params = {
         "id-cmde": id_cmde,
     }
@@ -43,12 +40,21 @@ def download_file(api_key: str, id_cmde: str, output_path: str, timeout: float,
         "https": os.environ.get("HTTPS_PROXY"),
     }
 
-    resp = requests.get(url, headers=headers, params=params, timeout=timeout, proxies=proxies, verify=verify_ssl)
-    resp.raise_for_status()
+    with _http.stream(api_key, url, params=params, timeout=timeout, verify=verify_ssl, proxies=proxies) as (headers, chunks):
+        # Taille annoncée : réservée d'avance sur disque si le corps n'est pas compressé (POSIX uniquement)
+        size = int(headers.get("content-length", 0) or 0)
+        if headers.get("content-encoding"):
+            size = 0
 
-    # Sauvegarde du contenu binaire
-    with open(output_path, "wb") as f:
-        f.write(resp.content)
+        # Sauvegarde du contenu binaire, au fil de la réception
+        with open(output_path, "wb") as f:
+            if size and hasattr(os, "posix_fallocate"):
+                os.posix_fallocate(f.fileno(), 0, size)
+            written = 0
+            for chunk in chunks:
+                f.write(chunk)
+                written += len(chunk)
+            f.truncate(written)
 
 
 def main():
@@ -77,17 +83,17 @@ def main():
     try:
         download_file(args.api_key, args.id_cmde, args.output, args.timeout, verify_ssl)
         print(f"Fichier téléchargé avec succès: {args.output}")
-    except requests.exceptions.SSLError as e:
+    except _http.SSLError as e:
         print("Erreur SSL/TLS lors de la vérification du certificat.", file=sys.stderr)
         print(f"Détails: {e}", file=sys.stderr)
         print("Astuce: réexécutez avec --insecure pour tester (non recommandé en production).", file=sys.stderr)
         sys.exit(6)
-    except requests.HTTPError as e:
+    except _http.HTTPError as e:
         status = e.response.status_code if e.response else "N/A"
         content = e.response.text if e.response else ""
         print(f"Erreur HTTP {status}: {e}\nContenu: {content}", file=sys.stderr)
         sys.exit(3)
-    except requests.RequestException as e:
+    except _http.RequestException as e:
         print(f"Erreur de requête: {e}", file=sys.stderr)
         sys.exit(4)
     except OSError as e:
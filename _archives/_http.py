@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+
+"""
+Client HTTP partagé par les scripts (API Météo-France DPClim).
+Un seul client par processus : les connexions vers public-api.meteofrance.fr sont réutilisées d'un appel à l'autre.
+- httpx (pip install httpx) : HTTP/2 si le paquet 'h2' est installé (pip install "httpx[http2]"),
+  toutes les requêtes partagent alors une même connexion TCP+TLS multiplexée.
+- sinon requests.Session avec pool de connexions.
+Les proxies sont pris des variables d'environnement HTTP_PROXY/HTTPS_PROXY dans les deux cas.
+Les contextes TLS (vérifié / --insecure) sont construits une seule fois; autorités de certification :
+SSL_CERT_FILE si défini, sinon certifi si installé, sinon celles du système.
+"""
+
+import os
+import ssl
+import time
+import functools
+import contextlib
+import importlib.util
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+try:
+    import certifi
+except ImportError:
+    certifi = None
+
+RETRY_STATUS = (429, 500, 502, 503, 504)
+RETRY_TOTAL = 3
+RETRY_BACKOFF = 0.3
+CHUNK_SIZE = 64 * 1024
+
+
+@functools.lru_cache(maxsize=2)
+def _ssl_context(verify: bool) -> ssl.SSLContext:
+    """
+    SSLContext partagé par toutes les connexions d'un même mode : chargé une fois, au lieu d'un par connexion.
+    """
+    cafile = os.environ.get("SSL_CERT_FILE") or (certifi.where() if certifi is not None else None)
+    ctx = ssl.create_default_context(cafile=cafile)
+    if not verify:
+        ctx.check_hostname = False
+        ctx.verify_mode = ssl.CERT_NONE
+    return ctx
+
+if httpx is not None:
+    HTTP2 = importlib.util.find_spec("h2") is not None
+
+    # Exceptions exposées aux scripts, quel que soit le client utilisé
+    HTTPError = httpx.HTTPStatusError
+    RequestException = httpx.HTTPError
+
+    class SSLError(httpx.ConnectError):
+        """Échec de la vérification du certificat (httpx ne distingue pas ce cas de ConnectError)."""
+
+    _CLIENTS: Dict[Tuple[bool, Optional[str], Optional[str]], "httpx.Client"] = {}
+
+    def _client(api_key: str, verify: bool, proxies: Optional[Dict[str, str]] = None) -> "httpx.Client":
+        """
+        Client partagé par mode TLS et proxies. Sans transport explicite, httpx lit lui-même HTTP(S)_PROXY/NO_PROXY;
+        les proxies passés en argument sont montés par schéma.
+        """
+        proxies = proxies or {}
+        key = (verify, proxies.get("http"), proxies.get("https"))
+        client = _CLIENTS.get(key)
+        if client is None:
+            limits = httpx.Limits(max_connections=16, max_keepalive_connections=16)
+            mounts = {
+                f"{scheme}://": httpx.HTTPTransport(proxy=proxy, http2=HTTP2, verify=_ssl_context(verify), limits=limits)
+                for scheme, proxy in (("http", key[1]), ("https", key[2])) if proxy
+            }
+            client = httpx.Client(
+                http2=HTTP2,
+                verify=_ssl_context(verify),
+                limits=limits,
+                mounts=mounts or None,
+                headers={"accept": "*/*"},
+            )
+            _CLIENTS[key] = client
+        client.headers["apikey"] = api_key
+        return client
+
+    @contextlib.contextmanager
+    def _ssl_errors():
+        try:
+            yield
+        except httpx.ConnectError as e:
+            # httpcore ne conserve pas l'ssl.SSLError d'origine : seul le message l'identifie ('[SSL: ...]')
+            if str(e).startswith("[SSL"):
+                raise SSLError(str(e), request=e.request) from e
+            raise
+
+    def get(api_key: str, url: str, params: Optional[Dict[str, Any]] = None, headers: Optional[Dict[str, str]] = None,
+            timeout: Optional[float] = None, verify: bool = True, proxies: Optional[Dict[str, str]] = None):
+        """
+        GET sur le client partagé; réessaie sur erreur de connexion et sur 429/5xx avec attente exponentielle.
+        """
+        with _ssl_errors():
+            for attempt in range(RETRY_TOTAL + 1):
+                try:
+                    resp = _client(api_key, verify, proxies).get(url, params=params, headers=headers, timeout=timeout)
+                except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+                    if attempt == RETRY_TOTAL or str(e).startswith("[SSL"):
+                        raise
+                else:
+                    if resp.status_code not in RETRY_STATUS or attempt == RETRY_TOTAL:
+                        return resp
+                time.sleep(RETRY_BACKOFF * 2 ** attempt)
+
+    @contextlib.contextmanager
+    def stream(api_key: str, url: str, params: Optional[Dict[str, Any]] = None, timeout: Optional[float] = None,
+               verify: bool = True, proxies: Optional[Dict[str, str]] = None) -> Iterator[Tuple[Any, Iterator[bytes]]]:
+        """
+        GET en streaming : fournit (en-têtes, itérateur de blocs décodés) sans charger le corps en mémoire.
+        """
+        with _ssl_errors():
+            with _client(api_key, verify, proxies).stream("GET", url, params=params, timeout=timeout) as resp:
+                if resp.is_error:
+                    resp.read()  # corps d'erreur lu : e.response.text reste accessible à l'appelant
+                resp.raise_for_status()
+                yield resp.headers, resp.iter_bytes(CHUNK_SIZE)
+
+else:
+    HTTPError = requests.HTTPError
+    RequestException = requests.RequestException
+    SSLError = requests.exceptions.SSLError
+
+    class _SSLContextAdapter(HTTPAdapter):
+        """
+        HTTPAdapter dont les pools (directs ou via proxy) réutilisent un SSLContext fourni.
+        """
+        def __init__(self, ssl_context: ssl.SSLContext, **kwargs):
+            self._ssl_context = ssl_context  # avant super().__init__, qui appelle init_poolmanager
+            super().__init__(**kwargs)
+
+        def init_poolmanager(self, *args, **kwargs):
+            kwargs["ssl_context"] = self._ssl_context
+            return super().init_poolmanager(*args, **kwargs)
+
+        def proxy_manager_for(self, proxy, **proxy_kwargs):
+            proxy_kwargs["ssl_context"] = self._ssl_context
+            return super().proxy_manager_for(proxy, **proxy_kwargs)
+
+    _SESSIONS: Dict[bool, "requests.Session"] = {}
+
+    def _session(api_key: str, verify: bool) -> "requests.Session":
+        session = _SESSIONS.get(verify)
+        if session is None:
+            session = requests.Session()
+            session.mount("https://", _SSLContextAdapter(
+                _ssl_context(verify),
+                pool_connections=16,
+                pool_maxsize=32,
+                max_retries=Retry(total=RETRY_TOTAL, backoff_factor=RETRY_BACKOFF, status_forcelist=list(RETRY_STATUS),
+                                  raise_on_status=False),  # raise_for_status() garde la main sur les erreurs HTTP
+            ))
+            session.headers.update({"accept": "*/*"})
+            _SESSIONS[verify] = session
+        session.headers["apikey"] = api_key
+        return session
+
+    def get(api_key: str, url: str, params: Optional[Dict[str, Any]] = None, headers: Optional[Dict[str, str]] = None,
+            timeout: Optional[float] = None, verify: bool = True, proxies: Optional[Dict[str, str]] = None):
+        """
+        GET sur la session partagée; réessaie sur 429/5xx avec attente exponentielle.
+        """
+        return _session(api_key, verify).get(url, params=params, headers=headers, timeout=timeout, proxies=proxies, verify=verify)
+
+    @contextlib.contextmanager
+    def stream(api_key: str, url: str, params: Optional[Dict[str, Any]] = None, timeout: Optional[float] = None,
+               verify: bool = True, proxies: Optional[Dict[str, str]] = None) -> Iterator[Tuple[Any, Iterator[bytes]]]:
+        """
+        GET en streaming : fournit (en-têtes, itérateur de blocs décodés) sans charger le corps en mémoire.
+        """
+        with _session(api_key, verify).get(url, params=params, timeout=timeout, proxies=proxies, verify=verify, stream=True) as resp:
+            resp.raise_for_status()
+            # raw.stream évite la couche iter_content; decode_content=True décompresse un éventuel gzip
+            yield resp.headers, resp.raw.stream(CHUNK_SIZE, decode_content=True)
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+
+"""
+Lecture/écriture JSON partagée par les scripts.
+Utilise orjson s'il est installé (pip install orjson), sinon le module json standard.
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# orjson.JSONDecodeError hérite de json.JSONDecodeError
+JSONDecodeError = json.JSONDecodeError
+
+
+def loads(data):
+    """
+    Décode un document JSON (str ou bytes, ex: resp.content).
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj, indent: bool = False) -> str:
+    """
+    Encode en JSON (UTF-8 non échappé, comme ensure_ascii=False).
+    indent=True : indentation de 2 espaces.
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, option=option).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, indent=2 if indent else None)
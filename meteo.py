@@ -1,16 +1,327 @@
 import os
+import csv
 import sys
-import json
 import math
+import time
+import shutil
+import atexit
+import asyncio
+import tempfile
+import contextlib
+import functools
+import threading
+from dataclasses import dataclass
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib3.util.request import ACCEPT_ENCODING
 from datetime import datetime
-from typing import List, Dict, Any, Tuple, Optional
+from typing import List, Dict, Any, Tuple, Optional, Union
 from pathlib import Path
+from geopy.adapters import RequestsAdapter
 from geopy.geocoders import Nominatim
 from geopy.extra.rate_limiter import RateLimiter
-import pandas as pd
-# from openpyxl import load_workbook
-import win32com.client as win32
+import numpy as np
+import orjson
+
+try:
+    from openpyxl import load_workbook
+    from openpyxl.utils import column_index_from_string
+except ImportError:
+    load_workbook = column_index_from_string = None  # écriture du classeur fermé sans Excel
+
+try:
+    import win32com.client as win32
+except ImportError:
+    win32 = None  # requis uniquement si le classeur est ouvert dans Excel (Windows)
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None  # requis uniquement pour le mode asynchrone (--async)
+
+try:
+    import requests_cache
+except ImportError:
+    requests_cache = None  # cache HTTP du géocodage facultatif
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None  # noyau compilé de find_nearest_station facultatif (sinon NumPy)
+
+R_EARTH_KM = 6371.0088  # rayon moyen de la Terre (km)
+KM_PER_DEG = 111.0      # longueur d'un degré de latitude (km), pour le préfiltre équirectangulaire
+NEAREST_MAX_KM = 50.0   # rayon du préfiltre de find_nearest_station (km)
+
+# Production d'un fichier de commande DPClim : 204 tant qu'elle est en cours
+POLL_STATUS = (202, 204)
+POLL_DELAY = 0.5       # première attente (s), doublée à chaque interrogation...
+POLL_DELAY_MAX = 8.0   # ... jusqu'à ce plafond
+POLL_TIMEOUT = 300.0   # attente maximale (s) par fichier
+DOWNLOAD_CHUNK = 64 * 1024  # taille des blocs copiés sur disque pendant le téléchargement
+
+# Réponses Nominatim conservées sur disque (requests_cache) : les coordonnées d'une ville ne changent pas
+GEOCODE_CACHE = "geopy_cache"
+GEOCODE_CACHE_EXPIRE = 30 * 86400  # 30 jours
+GEOCODE_MIN_DELAY = 1.0  # politique d'usage Nominatim : au plus une requête par seconde
+
+# Bounding boxes des départements (west, south, east, north), récupérées une seule fois
+BBOXES_FILE = Path("departements") / "_bboxes.json"
+
+# Géocodages réussis, conservés d'une exécution à l'autre : "ville|département|pays|langue" -> [ville, lat, lon, label]
+GEOCACHE_FILE = Path("geocache.json")
+
+# Excel : mode de calcul manuel (win32.constants n'est renseigné qu'avec gencache.EnsureDispatch)
+XL_CALCULATION_MANUAL = -4135
+
+# Codes département -> noms (requête Nominatim structurée 'county'); la Corse a ses deux codes 2A/2B
+DEPARTEMENTS: Dict[str, str] = {
+    "01": "Ain", "02": "Aisne", "03": "Allier", "04": "Alpes-de-Haute-Provence", "05": "Hautes-Alpes",
+    "06": "Alpes-Maritimes", "07": "Ardèche", "08": "Ardennes", "09": "Ariège", "10": "Aube", "11": "Aude",
+    "12": "Aveyron", "13": "Bouches-du-Rhône", "14": "Calvados", "15": "Cantal", "16": "Charente",
+    "17": "Charente-Maritime", "18": "Cher", "19": "Corrèze", "2A": "Corse-du-Sud", "2B": "Haute-Corse",
+    "21": "Côte-d'Or", "22": "Côtes-d'Armor", "23": "Creuse", "24": "Dordogne", "25": "Doubs", "26": "Drôme",
+    "27": "Eure", "28": "Eure-et-Loir", "29": "Finistère", "30": "Gard", "31": "Haute-Garonne", "32": "Gers",
+    "33": "Gironde", "34": "Hérault", "35": "Ille-et-Vilaine", "36": "Indre", "37": "Indre-et-Loire", "38": "Isère",
+    "39": "Jura", "40": "Landes", "41": "Loir-et-Cher", "42": "Loire", "43": "Haute-Loire", "44": "Loire-Atlantique",
+    "45": "Loiret", "46": "Lot", "47": "Lot-et-Garonne", "48": "Lozère", "49": "Maine-et-Loire", "50": "Manche",
+    "51": "Marne", "52": "Haute-Marne", "53": "Mayenne", "54": "Meurthe-et-Moselle", "55": "Meuse", "56": "Morbihan",
+    "57": "Moselle", "58": "Nièvre", "59": "Nord", "60": "Oise", "61": "Orne", "62": "Pas-de-Calais",
+    "63": "Puy-de-Dôme", "64": "Pyrénées-Atlantiques", "65": "Hautes-Pyrénées", "66": "Pyrénées-Orientales",
+    "67": "Bas-Rhin", "68": "Haut-Rhin", "69": "Rhône", "70": "Haute-Saône", "71": "Saône-et-Loire", "72": "Sarthe",
+    "73": "Savoie", "74": "Haute-Savoie", "75": "Paris", "76": "Seine-Maritime", "77": "Seine-et-Marne",
+    "78": "Yvelines", "79": "Deux-Sèvres", "80": "Somme", "81": "Tarn", "82": "Tarn-et-Garonne", "83": "Var",
+    "84": "Vaucluse", "85": "Vendée", "86": "Vienne", "87": "Haute-Vienne", "88": "Vosges", "89": "Yonne",
+    "90": "Territoire de Belfort", "91": "Essonne", "92": "Hauts-de-Seine", "93": "Seine-Saint-Denis",
+    "94": "Val-de-Marne", "95": "Val-d'Oise", "971": "Guadeloupe", "972": "Martinique", "973": "Guyane",
+    "974": "La Réunion", "975": "Saint-Pierre-et-Miquelon", "976": "Mayotte",
+}
+
+
+if njit is not None:
+    # fastmath sans 'nnan'/'ninf' : le minimum part de math.inf
+    @njit(cache=True, fastmath={"nsz", "arcp", "contract", "afn", "reassoc"})
+    def _nearest_kernel(phi1, cos_phi1, lambda1, phi, cos_phi, lam, open_):
+        """
+        Indice de la station ouverte la plus proche (-1 si aucune) et son terme Haversine 'a',
+        en une seule boucle compilée, sans tableaux intermédiaires. Angles en radians.
+        """
+        best = -1
+        best_a = math.inf
+        for i in range(phi.shape[0]):
+            if not open_[i]:
+                continue
+            s_dphi = math.sin((phi[i] - phi1) / 2)
+            s_dlambda = math.sin((lam[i] - lambda1) / 2)
+            a = s_dphi * s_dphi + cos_phi1 * cos_phi[i] * s_dlambda * s_dlambda
+            if a < best_a:
+                best = i
+                best_a = a
+        return best, best_a
+else:
+    _nearest_kernel = None
+
+
+def _excel_locked(path: str) -> bool:
+    """
+    True si le classeur est ouvert dans Excel : fichier verrou '~$<nom>' à côté du classeur
+    (Excel remplace les 2 premiers caractères des noms longs, les deux formes sont testées).
+    """
+    directory, name = os.path.split(path)
+    return any(os.path.exists(os.path.join(directory, "~$" + lock)) for lock in (name, name[2:]))
+
+
+class MeteoAPIError(Exception):
+    """
+    Échec du traitement d'une ville ou d'un département (requête, réponse invalide, aucune station...).
+    'exit_code' : code de sortie utilisé par le script principal.
+    """
+    exit_code = 4
+
+
+class MeteoHTTPError(MeteoAPIError):
+    """
+    Réponse HTTP en erreur de l'API Météo-France.
+    """
+    exit_code = 3
+
+
+class MeteoSSLError(MeteoAPIError):
+    """
+    Échec de la vérification du certificat TLS.
+    """
+    exit_code = 6
+
+
+def _file_pending(content_type: str, body: bytes, command_id: str) -> bool:
+    """
+    Réponse JSON de 'commande/fichier' à la place du CSV : vrai si elle signale une production encore en cours
+    (ex: {"message": "Production encore en cours"}); toute autre réponse JSON lève ValueError.
+    """
+    if b"en cours" in body.lower():
+        return True
+    raise ValueError(f"Réponse inattendue ({content_type}) pour le fichier de la commande {command_id}: {body[:200]!r}")
+
+
+def _departement_code(departement: Any) -> str:
+    return str(departement).strip().upper().zfill(2)
+
+
+def departement_name(departement: Any) -> Optional[str]:
+    """
+    Nom du département à partir de son code (49, "49", "2A", 971...); None si inconnu.
+    """
+    if departement is None:
+        return None
+    return DEPARTEMENTS.get(_departement_code(departement))
+
+
+def _departement_key(city: Dict[str, Any]) -> Tuple[Optional[str], str]:
+    departement = city.get('departement')
+    return None if departement is None else _departement_code(departement), city.get('parameter', 'temperature')
+
+
+def _require_departement(departement: Any):
+    if departement is None:
+        raise MeteoAPIError("Département manquant : vérifiez que chaque ville a un département configuré dans le fichier JSON d'entrée.")
+
+
+def departement_groups(cities: List[Dict[str, Any]]) -> Dict[Tuple[Optional[str], str], Tuple[Any, bool, List[int]]]:
+    """
+    Villes regroupées par (code du département, paramètre) : 49 et "49", "1" et "01" forment un seul groupe.
+    Chaque groupe : (département de sa première ville, force si l'une de ses villes le demande, indices des villes).
+    """
+    groups: Dict[Tuple[Optional[str], str], Tuple[Any, bool, List[int]]] = {}
+    for index, city in enumerate(cities):
+        key = _departement_key(city)
+        first, force, indexes = groups.get(key, (city.get('departement'), False, []))
+        indexes.append(index)
+        groups[key] = (first, force or bool(city.get('force', False)), indexes)
+    return groups
+
+
+@contextlib.contextmanager
+def _atomic_write(path: Path):
+    """
+    Fichier temporaire (binaire) à côté de 'path', renommé en 'path' (os.replace) une fois écrit en entier :
+    un lecteur concurrent voit l'ancien fichier ou le nouveau, jamais un fichier à moitié écrit.
+    """
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f"{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            yield f
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp)
+        raise
+
+
+class _CachedRequestsAdapter(RequestsAdapter):
+    """
+    RequestsAdapter de geopy dont la session est une requests_cache.CachedSession.
+    Seules les requêtes Nominatim sont mises en cache; la session de l'API Météo-France n'est pas concernée.
+    L'intervalle minimal entre deux requêtes ne s'applique qu'aux requêtes réseau : une réponse en cache est immédiate.
+    """
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._lock = threading.Lock()
+        self._last_request = 0.0
+        session = requests_cache.CachedSession(GEOCODE_CACHE, expire_after=GEOCODE_CACHE_EXPIRE)
+        session.trust_env = self.session.trust_env
+        session.proxies = self.session.proxies
+        for prefix, adapter in self.session.adapters.items():
+            session.mount(prefix, adapter)
+        self.session = session
+
+    def _cached(self, url: str) -> bool:
+        """
+        Vrai si la réponse est en cache et encore valide : une entrée expirée repart vers Nominatim.
+        """
+        cache = self.session.cache
+        response = cache.get_response(cache.create_key(requests.Request("GET", url)))
+        return response is not None and not response.is_expired
+
+    def get_json(self, url, *, timeout, headers):
+        if not self._cached(url):
+            with self._lock:
+                wait = self._last_request + GEOCODE_MIN_DELAY - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+                self._last_request = time.monotonic()
+        return super().get_json(url, timeout=timeout, headers=headers)
+
+
+StationArrays = Tuple[List[Dict[str, Any]], np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+
+
+@functools.lru_cache(maxsize=128)
+def _load_stations(path: str, mtime_ns: int) -> StationArrays:
+    """
+    Stations d'un fichier département et leurs tableaux, lus et calculés une seule fois par processus.
+    'mtime_ns' fait partie de la clé : un fichier réécrit (--force) est relu.
+    """
+    with open(path, "rb") as f:
+        return _station_arrays(orjson.loads(f.read()))
+
+
+def _station_arrays(stations: List[Dict[str, Any]]) -> StationArrays:
+    """
+    (stations, lat, lon, ouverte, phi, cos(phi), lambda); phi/lambda : latitude/longitude en radians.
+    Une station sans 'lat'/'lon' numériques est marquée non ouverte.
+    """
+    lat = np.full(len(stations), np.nan)
+    lon = np.full(len(stations), np.nan)
+    open_ = np.zeros(len(stations), dtype=bool)
+    for i, st in enumerate(stations):
+        try:
+            lat[i] = float(st["lat"])
+            lon[i] = float(st["lon"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        open_[i] = bool(st.get('posteOuvert'))
+
+    # Ne dépendent que des stations : calculés ici plutôt qu'à chaque ville
+    phi = np.radians(lat)
+    return stations, lat, lon, open_, phi, np.cos(phi), np.radians(lon)
+
+
+@functools.lru_cache(maxsize=256)
+def _iso_midnight_z(date_str: str) -> str:
+    """
+    Voir Meteo.to_iso_midnight_z; mémorisé : les mêmes dates de période servent à toutes les commandes.
+    """
+    # Format fixe : contrôle longueur/chiffres et concaténation, sans strptime/strftime.
+    # Le constructeur datetime vérifie seulement que le jour et le mois existent.
+    # isascii : isdigit accepte aussi les chiffres non ASCII, que seul strptime/strftime normalise
+    if (len(date_str) == 10 and date_str.isascii() and date_str[4] == '-' and date_str[7] == '-'
+            and date_str[:4].isdigit() and date_str[5:7].isdigit() and date_str[8:].isdigit()):
+        try:
+            datetime(int(date_str[:4]), int(date_str[5:7]), int(date_str[8:]))
+            return date_str + "T00:00:00Z"
+        except ValueError:
+            pass
+    # Cas rares (ex: '2025-1-5', accepté par strptime) ou erreur : chemin d'origine
+    try:
+        dt = datetime.strptime(date_str, "%Y-%m-%d")
+    except ValueError as e:
+        raise ValueError(f"Date invalide '{date_str}'. Attendu: AAAA-MM-DD.") from e
+    return dt.strftime("%Y-%m-%dT00:00:00Z")
+
+
+@dataclass(slots=True)
+class CityResolved:
+    """
+    Ville traitée : coordonnées géocodées, libellé Nominatim, station DPClim retenue et commande passée.
+    """
+    name: str
+    lat: float
+    lon: float
+    label: str
+    station_id: str
+    command_id: str
+
 
 class Meteo:
     # Constructeur
@@ -26,7 +337,8 @@ class Meteo:
                  country: str = "France",
                  language: str = "fr",
                  timeout: float = 10.0,
-                 force: bool = False):
+                 force: bool = False,
+                 workers: int = 8):
     # Propriétés
         self.API_BASE_URL = api_base_url
         self.API_KEY = api_key
@@ -40,6 +352,60 @@ class Meteo:
         self.API_LANGUAGE = language
         self.API_TIMEOUT = timeout
         self.API_FORCE = force
+        self.API_WORKERS = workers
+
+        # Excel (COM) : instance, classeur et feuille ouverts à la première écriture, enregistrés par close_excel
+        self._excel = self._wb = self._ws = None
+        self._excel_settings = None
+
+        # Stations et tableaux par département (find_nearest_station), sans relecture du fichier
+        self._stations_by_dep: Dict[str, StationArrays] = {}
+
+        # Listes de stations déjà récupérées ou trouvées sur disque pendant cette exécution, par (département, paramètre)
+        self._dep_done: set[Tuple[str, str]] = set()
+
+        # Bounding boxes des départements, lues à la première utilisation depuis BBOXES_FILE
+        self._bboxes: Optional[Dict[str, Tuple[float, float, float, float]]] = None
+
+        # Géocodeur Nominatim construit ici, avant tout thread : un seul intervalle minimal entre requêtes pour le processus
+        self._geocoder, self._geocode = self._make_geocoder()
+
+        # Commandes déjà passées, par (station, début, fin) : une station partagée par plusieurs villes n'est commandée qu'une fois
+        self._command_ids: Dict[Tuple[str, str, str], str] = {}
+
+        # Géocodages réussis, par "ville|département|pays|langue" : lus depuis GEOCACHE_FILE, réécrits à la fermeture
+        # (ou à la sortie du processus) si de nouvelles villes ont été géocodées
+        self._geocode_memo: Dict[str, Tuple[str, float, float, str]] = self._load_geocache()
+        self._geocode_memo_dirty = False
+        atexit.register(self._save_geocache)
+
+        # Session HTTP partagée par tous les appels API : connexions TCP/TLS réutilisées (keep-alive).
+        # Au moins une connexion conservée par thread de traitement : aucune n'est refermée puis rouverte.
+        self._session = requests.Session()
+        # Réponses compressées (listes de stations JSON, CSV) : uniquement les encodages que urllib3 sait décoder
+        # ("gzip,deflate", plus "br" / "zstd" si brotli / zstandard sont installés)
+        self._session.headers.update({
+            "accept": "application/json",
+            "accept-encoding": ACCEPT_ENCODING,
+            "apikey": self.API_KEY,
+        })
+        self._session.mount("https://", HTTPAdapter(
+            pool_connections=10,
+            pool_maxsize=max(20, workers),
+            max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504],
+                              raise_on_status=False),  # raise_for_status() garde la main sur les erreurs HTTP
+        ))
+
+    def close(self):
+        self._save_geocache()
+        self._session.close()
+        self.close_excel()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
 
     # Méthodes
     def call_api_list(self, departement: str, parameter: str = 'temperature', timeout: float = 10.0, verify_ssl: bool = False) -> dict:
@@ -54,72 +420,94 @@ class Meteo:
         # os._exit(0)
 
         url = f"{self.API_BASE_URL}/liste-stations/quotidienne"
-        headers = {
-            "accept": "application/json",
-            "apikey": self.API_KEY,
-        }
         params = {
             "id-departement": departement,
             "parametre": parameter,
         }
 
-        resp = requests.get(url, headers=headers, params=params, timeout=timeout, verify=verify_ssl)
+        resp = self._session.get(url, params=params, timeout=timeout, verify=verify_ssl)
         resp.raise_for_status()
 
         try:
-            return resp.json()
-        except json.JSONDecodeError:
+            return orjson.loads(resp.content)
+        except orjson.JSONDecodeError:
             raise ValueError("La réponse n'est pas un JSON valide.")
 
 
-    def call_api_command(self, date_deb: str, date_fin: str, timeout: float = 10.0, verify_ssl: bool = False) -> str:
+    def call_api_command(self, station_id: str, date_deb: str, date_fin: str, timeout: float = 10.0, verify_ssl: bool = False) -> str:
         """
-        Appelle l'API DPClim et retourne le JSON.
+        Commande les données quotidiennes de la station et retourne l'identifiant de la commande.
+        Une commande identique déjà passée pendant ce traitement est réutilisée.
         """
+        key = (station_id, date_deb, date_fin)
+        if key in self._command_ids:
+            return self._command_ids[key]
+
         url = f"{self.API_BASE_URL}/commande-station/quotidienne"
-        headers = {
-            "accept": "application/json",
-            "apikey": self.API_KEY,
-        }
         params = {
-            "id-station": self.NEAREST_STATION_ID,
+            "id-station": station_id,
             "date-deb-periode": self.to_iso_midnight_z(date_deb),
             "date-fin-periode": self.to_iso_midnight_z(date_fin),
         }
 
-        resp = requests.get(url, headers=headers, params=params, timeout=timeout, verify=verify_ssl)
+        resp = self._session.get(url, params=params, timeout=timeout, verify=verify_ssl)
         resp.raise_for_status()
 
         try:
-            self.API_COMMAND_ID = resp.json().get('elaboreProduitAvecDemandeResponse', {}).get('return', None)
-        except json.JSONDecodeError:
+            data = orjson.loads(resp.content)
+        except orjson.JSONDecodeError:
             raise ValueError("La réponse n'est pas un JSON valide.")
 
-        return self.API_COMMAND_ID
+        command_id = data.get('elaboreProduitAvecDemandeResponse', {}).get('return', None)
+        if command_id is not None:
+            self._command_ids[key] = command_id
+        return command_id
 
 
-    def call_api_download_file(self, city: str, timeout: float = 10.0, verify_ssl: bool = False):
+    def call_api_download_file(self, city: str, command_id: str, timeout: float = 10.0, verify_ssl: bool = False):
         """
         Télécharge le fichier associé à la commande DPClim.
         """
         url = f"{self.API_BASE_URL}/commande/fichier"
-        headers = {
-            "accept": "application/json",
-            "apikey": self.API_KEY,
-        }
         params = {
-            "id-cmde": self.API_COMMAND_ID,
+            "id-cmde": command_id,
         }
 
-        resp = requests.get(url, headers=headers, params=params, timeout=timeout, verify=verify_ssl)
-        resp.raise_for_status()
-
         city_file = Path(f"{self.API_CURRENT_DIR}\\cities\\{city}.csv")
         city_file.parent.mkdir(parents=True, exist_ok=True)
 
-        # Sauvegarde du contenu binaire
-        with open(city_file, "wb") as f:
-            f.write(resp.content)
+        with self._wait_for_file(url, params, command_id, timeout, verify_ssl) as resp:
+            # Sauvegarde du contenu binaire, au fil de la réception (sans charger le fichier en mémoire)
+            resp.raw.decode_content = True  # décompresse au fil de l'eau (gzip, deflate...)
+            with _atomic_write(city_file) as f:
+                shutil.copyfileobj(resp.raw, f, length=DOWNLOAD_CHUNK)
+
+
+    def _wait_for_file(self, url: str, params: Dict[str, Any], command_id: str, timeout: float, verify_ssl: bool) -> requests.Response:
+        """
+        Interroge l'API tant que le fichier de la commande est en production (POLL_STATUS, ou réponse JSON
+        "en cours"), avec une attente qui double à chaque essai (POLL_DELAY à POLL_DELAY_MAX).
+        Retourne la réponse (en streaming) du fichier prêt. Lève TimeoutError au-delà de POLL_TIMEOUT secondes.
+        """
+        delay = POLL_DELAY
+        deadline = time.monotonic() + POLL_TIMEOUT
+        while True:
+            resp = self._session.get(url, params=params, timeout=timeout, verify=verify_ssl, stream=True)
+            if resp.status_code not in POLL_STATUS:
+                if not resp.ok:
+                    resp.content  # message d'erreur lu en entier : la connexion est rendue au pool
+                    resp.raise_for_status()
+                content_type = resp.headers.get("Content-Type", "")
+                if "json" not in content_type:
+                    return resp
+                with resp:
+                    _file_pending(content_type, resp.content, command_id)
+            else:
+                resp.close()
+            if time.monotonic() + delay > deadline:
+                raise TimeoutError(f"Fichier de la commande {command_id} toujours en production après {POLL_TIMEOUT:.0f} s.")
+            time.sleep(delay)
+            delay = min(delay * 2, POLL_DELAY_MAX)
 
 
     def to_iso_midnight_z(self, date_str: str) -> str:
@@ -127,152 +515,282 @@ class Meteo:
         Convertit une date 'AAAA-MM-DD' en 'YYYY-MM-DDT00:00:00Z'.
         Valide le format d'entrée; lève ValueError si invalide.
         """
-        try:
-            dt = datetime.strptime(date_str, "%Y-%m-%d")
-        except ValueError as e:
-            raise ValueError(f"Date invalide '{date_str}'. Attendu: AAAA-MM-DD.") from e
-        return dt.strftime("%Y-%m-%dT00:00:00Z")
+        return _iso_midnight_z(date_str)
 
 
     def _should_write_json(self, path: Path) -> bool:
-        if not path.exists():
+        """
+        Vrai si le fichier est absent ou ne commence pas par une liste non vide.
+        Seuls les premiers octets sont lus : les fichiers sont publiés complets (_atomic_write), inutile de tout parser.
+        """
+        try:
+            if path.stat().st_size < 3:  # plus petite liste non vide : '[0]'
+                return True
+            with path.open("rb") as f:
+                head = f.read(64).lstrip()
+        except OSError:
             return True
+        if not head.startswith(b"["):
+            return True
+        first = head[1:].lstrip()[:1]
+        if first:
+            return first == b"]"
+        # Premiers octets non concluants (blancs après '[') : lecture complète
         try:
-            with path.open("r", encoding="utf-8") as f:
-                data = json.load(f)
-            return not (isinstance(data, list) and len(data) > 0)
-        except json.JSONDecodeError:
+            data = orjson.loads(path.read_bytes())
+        except (OSError, orjson.JSONDecodeError):
             return True
+        return not (isinstance(data, list) and len(data) > 0)
 
 
-    def write_stations_by_departement(self, departement: str, parameter: str, force: bool = False, timeout: float = 10.0):
+    @contextlib.contextmanager
+    def _api_errors(self):
+        """
+        Traduit les exceptions de requests (et les réponses invalides) en MeteoAPIError et sous-classes :
+        une ville en échec n'interrompt pas les autres, l'appelant décide de la suite.
+        """
         try:
-            data = self.call_api_list(departement, parameter, timeout)
+            yield
+        except requests.exceptions.SSLError as e:
+            raise MeteoSSLError(
+                "Erreur SSL/TLS lors de la vérification du certificat.\n"
+                f"Détails: {e}\n"
+                "Astuce: réexécutez avec --insecure pour tester (non recommandé en production)."
+            ) from e
         except requests.HTTPError as e:
-            print(f"Erreur HTTP: {e}", file=sys.stderr)
-            sys.exit(3)
-        except Exception as e:
-            print(f"Erreur: {e}", file=sys.stderr)
-            sys.exit(4)
+            status = e.response.status_code if e.response is not None else "N/A"
+            content = e.response.text if e.response is not None else ""
+            raise MeteoHTTPError(f"Erreur HTTP {status}: {e}\nContenu: {content}") from e
+        except (requests.RequestException, ValueError, TimeoutError) as e:
+            raise MeteoAPIError(f"Erreur de requête: {e}") from e
+
+
+    def write_stations_by_departement(self, departement: str, parameter: str, force: bool = False, timeout: float = 10.0):
+        """
+        Récupère et enregistre la liste des stations du département; lève MeteoAPIError en cas d'échec.
+        """
+        _require_departement(departement)
+        if self._stations_up_to_date(departement, parameter, force):
+            return
+        with self._api_errors():
+            data = self.call_api_list(departement, parameter, timeout)
+
+        self._save_stations(departement, data, force)
+        self._dep_done.add((_departement_code(departement), parameter))
 
-        departement_file = Path("departements") / f"{departement}.json"
+
+    def _stations_up_to_date(self, departement: str, parameter: str, force: bool = False) -> bool:
+        """
+        Vrai si la liste des stations n'est pas à récupérer (sans --force) : département déjà traité pendant
+        cette exécution, ou fichier déjà présent sur disque (aucun appel à l'API dans ce cas).
+        """
+        if force or self.API_FORCE:
+            return False
+        key = (_departement_code(departement), parameter)
+        if key in self._dep_done:
+            return True
+        if self._should_write_json(Path("departements") / f"{_departement_code(departement)}.json"):
+            return False
+        print(f"Les stations météo pour le département {departement} existent déjà dans le répertoire 'departements'.")
+        print(f"Utilisez l'argument --force pour forcer la récupération des stations.")
+        self._dep_done.add(key)
+        return True
+
+
+    def _save_stations(self, departement: str, data: Any, force: bool = False):
+        departement_file = Path("departements") / f"{_departement_code(departement)}.json"
         departement_file.parent.mkdir(parents=True, exist_ok=True)
 
         if self._should_write_json(departement_file) or self.API_FORCE or force:
-            with open(departement_file, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            with _atomic_write(departement_file) as f:
+                f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
                 print(f"Les stations météo pour le département {departement} ont été sauvegardées dans le fichier JSON: {departement_file}")
+            # Liste déjà en mémoire : find_nearest_station ne relit pas le fichier qui vient d'être écrit
+            self._stations_by_dep[_departement_code(departement)] = _station_arrays(data)
         else:
             print(f"Les stations météo pour le département {departement} existent déjà dans le répertoire 'departements'.")
             print(f"Utilisez l'argument --force pour forcer la récupération des stations.")
 
 
     def _make_geocoder(self):
+        # Appelé une seule fois (constructeur) : une session HTTP et un RateLimiter partagés par tous les géocodages
         # Nominatim exige un user_agent explicite et identifiable
+        if requests_cache is not None:
+            # L'adaptateur n'espace que les requêtes réseau : pas de RateLimiter, les réponses en cache n'attendent pas
+            geolocator = Nominatim(user_agent="m365copilot-geocoder-demo", adapter_factory=_CachedRequestsAdapter)
+            return geolocator, geolocator.geocode
         geolocator = Nominatim(user_agent="m365copilot-geocoder-demo")
-        geocode = RateLimiter(geolocator.geocode, min_delay_seconds=1)  # respect du service
+        # swallow_exceptions=False : une erreur réseau est levée, et non confondue avec une absence de résultat (None)
+        geocode = RateLimiter(geolocator.geocode, min_delay_seconds=GEOCODE_MIN_DELAY, swallow_exceptions=False)  # respect du service
         return geolocator, geocode
 
 
-    # def _try_geocode_department_bbox(
-    #     self,
-    #     department: str,
-    #     country: str = "France",
-    #     language: str = "fr",
-    # ) -> Optional[Tuple[float, float, float, float]]:
-    #     """
-    #     Géocode le département à partir de son code (ex: '19', '2A') et retourne sa bounding box (west, south, east, north).
-    #     On tente plusieurs formulations pour Nominatim.
-    #     """
-    #     _, geocode = self._make_geocoder()
-
-    #     # Variantes de requêtes pour maximiser les chances de trouver le département par code
-    #     queries: List[str] = [
-    #         f"Département {department}, {country}",
-    #         f"Department {department}, {country}",
-    #         f"Dept {department}, {country}",
-    #         f"{department} {country} département",
-    #         f"{department}, {country} département",
-    #     ]
-
-    #     for q in queries:
-    #         try:
-    #             d = geocode(q, language=language, addressdetails=True, country_codes="fr", exactly_one=True)
-    #             if d and getattr(d, "raw", None) and d.raw.get("boundingbox"):
-    #                 south, north, west, east = map(float, d.raw["boundingbox"])  # [S, N, W, E]
-    #                 return (west, south, east, north)
-    #         except Exception:
-    #             # On poursuit avec la prochaine variante
-    #             continue
-    #     return None
+    def _try_geocode_department_bbox(
+        self,
+        department: str,
+        country: str = "France",
+        language: str = "fr",
+    ) -> Optional[Tuple[float, float, float, float]]:
+        """
+        Géocode le département à partir de son code (ex: '19', '2A') et retourne sa bounding box (west, south, east, north).
+        Les bounding boxes déjà connues sont lues depuis 'departements/_bboxes.json' sans appel à Nominatim;
+        une nouvelle bounding box y est ajoutée, ainsi qu'un échec (null) lorsque aucune variante n'a de résultat
+        (mais pas après une erreur réseau, retentée à l'exécution suivante).
+        On tente plusieurs formulations pour Nominatim.
+        """
+        code = _departement_code(department)
+        bboxes = self._load_bboxes()
+        if code in bboxes:
+            return bboxes[code]
+
+        geocode = self._geocode
+
+        # Variantes de requêtes pour maximiser les chances de trouver le département par code
+        queries: List[str] = [
+            f"Département {department}, {country}",
+            f"Department {department}, {country}",
+            f"Dept {department}, {country}",
+            f"{department} {country} département",
+            f"{department}, {country} département",
+        ]
+
+        failed = False
+        for q in queries:
+            try:
+                d = geocode(q, language=language, addressdetails=True, country_codes="fr", exactly_one=True)
+                if d and getattr(d, "raw", None) and d.raw.get("boundingbox"):
+                    south, north, west, east = map(float, d.raw["boundingbox"])  # [S, N, W, E]
+                    bboxes[code] = (west, south, east, north)
+                    self._save_bboxes()
+                    return bboxes[code]
+            except Exception:
+                # On poursuit avec la prochaine variante
+                failed = True
+                continue
+        if not failed:
+            bboxes[code] = None
+            self._save_bboxes()
+        return None
+
+
+    def prefetch_departement_bboxes(self, departements: List[str], country: str = "France", language: str = "fr"):
+        """
+        Récupère en une fois les bounding boxes manquantes des départements donnés (une seule fois par département,
+        conservées ensuite dans 'departements/_bboxes.json'). À appeler avant de géocoder les villes :
+        geocode_city_with_county n'utilise que les bounding boxes déjà connues.
+        """
+        for departement in departements:
+            if departement is not None:
+                self._try_geocode_department_bbox(departement, country=country, language=language)
+
+
+    def _load_bboxes(self) -> Dict[str, Tuple[float, float, float, float]]:
+        if self._bboxes is None:
+            try:
+                self._bboxes = {code: None if bbox is None else tuple(bbox)
+                                for code, bbox in orjson.loads(BBOXES_FILE.read_bytes()).items()}
+            except (OSError, orjson.JSONDecodeError):
+                self._bboxes = {}
+        return self._bboxes
+
+
+    def _save_bboxes(self):
+        BBOXES_FILE.parent.mkdir(parents=True, exist_ok=True)
+        with _atomic_write(BBOXES_FILE) as f:
+            f.write(orjson.dumps(self._bboxes))
+
+
+    def _load_geocache(self) -> Dict[str, Tuple[str, float, float, str]]:
+        try:
+            return {key: tuple(value) for key, value in orjson.loads(GEOCACHE_FILE.read_bytes()).items()}
+        except (OSError, orjson.JSONDecodeError):
+            return {}
+
+
+    def _save_geocache(self):
+        if not self._geocode_memo_dirty:
+            return
+        self._geocode_memo_dirty = False
+        with _atomic_write(GEOCACHE_FILE) as f:
+            f.write(orjson.dumps(self._geocode_memo))
+
+
+    def _geocode_key(self, city: str, county: Optional[str], country: str, language: str, departement: Optional[str]) -> str:
+        return f"{city}|{county or departement_name(departement)}|{country}|{language}"
+
+
+    def is_geocoded(self, city: Dict[str, Any]) -> bool:
+        """
+        Vrai si la ville (élément du fichier d'entrées) est déjà dans le cache des géocodages : aucune requête Nominatim.
+        """
+        return self._geocode_key(city.get('name'), city.get('county'), city.get('country', 'France'),
+                                 city.get('language', 'fr'), city.get('departement')) in self._geocode_memo
 
 
     def geocode_city_with_county(
         self,
         city: str,
-        county: str,
+        county: Optional[str] = None,
         country: str = "France",
         language: str = "fr",
-    ) -> Optional[Tuple[float, float, str]]:
+        departement: Optional[str] = None,
+    ) -> Optional[Tuple[str, float, float, str]]:
         """
-        Géocode une ville en précisant le département par son code.
+        Géocode une ville en précisant son département (nom 'county', sinon déduit du code 'departement').
         Stratégie :
-        1) Essayer des requêtes directes (ville + code département)
-        2) Fallback : bornage au périmètre du département via bounding box
-        Retourne (lat, lon, label) si trouvé, sinon None.
+        1) Une requête structurée (ville + nom du département + pays), qui aboutit en général du premier coup
+        2) Sinon, requêtes texte libre (ville + nom ou code du département)
+        3) Fallback : bornage au périmètre du département via bounding box (déjà connue : prefetch_departement_bboxes)
+        Retourne (ville, lat, lon, label) si trouvé, sinon None.
         """
-        geolocator, geocode = self._make_geocoder()
-
-        # 1) Essais directs : certaines variantes de requêtes "Ville, Département {code}, France"
-        direct_queries = [
-            {"city": city, "county": county, "country": country}
-        ]
+        # Même ville déjà géocodée (pendant ce traitement ou un précédent) : aucune requête
+        key = self._geocode_key(city, county, country, language, departement)
+        county = county or departement_name(departement)
+        if key in self._geocode_memo:
+            return self._geocode_memo[key]
+
+        geocode = self._geocode
+
+        # 1) Requête structurée, puis 2) variantes texte libre seulement si elle échoue
+        direct_queries = []
+        if county:
+            direct_queries.append({"city": city, "county": county, "country": country})
+            direct_queries.append(f"{city}, {county}, {country}")
+        if departement is not None:
+            direct_queries.append(f"{city}, Département {departement}, {country}")
+            direct_queries.append(f"{city}, {departement}, {country}")
         for q in direct_queries:
             try:
                 loc = geocode(q, language=language, addressdetails=True, country_codes="fr", exactly_one=True)
                 if loc:
-                    self.CITY_NAME = city
-                    self.CITY_LATITUDE = loc.latitude
-                    self.CITY_LONGITUDE = loc.longitude
-                    self.CITY_LABEL = loc.raw.get("display_name", "")
-                    return (
-                        self.CITY_NAME,
-                        self.CITY_LATITUDE,
-                        self.CITY_LONGITUDE,
-                        self.CITY_LABEL
-                    )
+                    self._geocode_memo[key] = (city, loc.latitude, loc.longitude, loc.raw.get("display_name", ""))
+                    self._geocode_memo_dirty = True
+                    return self._geocode_memo[key]
             except Exception:
                 continue
 
-        # # 2) Fallback : borner la recherche au département (via sa bbox)
-        # bbox = self._try_geocode_department_bbox(department, country=country, language=language)
-        # if bbox:
-        #     west, south, east, north = bbox
-        #     viewbox = [(west, south), (east, north)]  # geopy accepte [(min_lon, min_lat), (max_lon, max_lat)]
-        #     try:
-        #         loc = geocode(
-        #             city,
-        #             language=language,
-        #             addressdetails=True,
-        #             country_codes="fr",
-        #             viewbox=viewbox,
-        #             bounded=True,       # limite la recherche au viewbox
-        #             exactly_one=True,
-        #             limit=1,
-        #         )
-        #         if loc:
-        #             self.CITY_NAME = city
-        #             self.CITY_LATITUDE = loc.latitude
-        #             self.CITY_LONGITUDE = loc.longitude
-        #             self.CITY_LABEL = loc.raw.get("display_name", "")
-        #             return (
-        #                 self.CITY_NAME,
-        #                 self.CITY_LATITUDE,
-        #                 self.CITY_LONGITUDE,
-        #                 self.CITY_LABEL
-        #             )
-        #     except Exception:
-        #         pass
+        # 3) Fallback : borner la recherche au département (via sa bbox, lue sans appel à Nominatim)
+        bbox = self._load_bboxes().get(_departement_code(departement)) if departement is not None else None
+        if bbox:
+            west, south, east, north = bbox
+            viewbox = [(west, south), (east, north)]  # geopy accepte [(min_lon, min_lat), (max_lon, max_lat)]
+            try:
+                loc = geocode(
+                    city,
+                    language=language,
+                    addressdetails=True,
+                    country_codes="fr",
+                    viewbox=viewbox,
+                    bounded=True,       # limite la recherche au viewbox
+                    exactly_one=True,
+                    limit=1,
+                )
+                if loc:
+                    self._geocode_memo[key] = (city, loc.latitude, loc.longitude, loc.raw.get("display_name", ""))
+                    self._geocode_memo_dirty = True
+                    return self._geocode_memo[key]
+            except Exception:
+                pass
 
         # Aucun résultat
         return None
@@ -282,84 +800,255 @@ class Meteo:
         """
         Distance grand cercle (Haversine) entre deux points (en km).
         """
-        R = 6371.0088  # rayon moyen de la Terre (km)
         phi1 = math.radians(lat1)
         phi2 = math.radians(lat2)
         dphi = math.radians(lat2 - lat1)
         dlambda = math.radians(lon2 - lon1)
 
         a = math.sin(dphi/2)**2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda/2)**2
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-        return R * c
+        return 2 * R_EARTH_KM * math.asin(math.sqrt(a))
 
 
     def find_nearest_station(
         self,
         city_lat: float,
         city_lon: float,
-        departement: str
+        departement: str,
+        max_km: float = NEAREST_MAX_KM
     ) -> Tuple[Optional[Dict[str, Any]], Optional[float]]:
         """
         Retourne (station_la_plus_proche, distance_km). Si aucune station valide n'est trouvée, (None, None).
         Une station est considérée valide si elle possède des champs 'lat' et 'lon' numériques.
+        'max_km' : seules les stations à moins de max_km (approximation équirectangulaire) passent par Haversine;
+        si aucune n'est dans ce rayon, toutes les stations ouvertes sont comparées.
+        Avec numba, une boucle compilée compare directement toutes les stations ouvertes (sans préfiltre).
         """
-        file_path = f"departements/{departement}.json"
-        stations = self.load_stations_from_file(file_path)
-        
-        nearest: Optional[Dict[str, Any]] = None
-        best_dist: Optional[float] = None
-
-        for st in stations:
-            if not st['posteOuvert']:
-                continue
-            try:
-                slat = float(st["lat"])
-                slon = float(st["lon"])
-            except (KeyError, TypeError, ValueError):
-                continue
-
-            d = self._haversine_km(city_lat, city_lon, slat, slon)
-            if best_dist is None or d < best_dist:
-                best_dist = d
-                nearest = st
-
-        self.NEAREST_STATION_ID = nearest['id']
-        return nearest, best_dist
+        code = _departement_code(departement)
+        arrays = self._stations_by_dep.get(code)
+        if arrays is None:
+            file_path = f"departements/{code}.json"
+            arrays = self._stations_by_dep[code] = _load_stations(file_path, os.stat(file_path).st_mtime_ns)
+        stations, lat, lon, open_, phi, cos_phi, lam = arrays
+        phi1 = math.radians(city_lat)
+        cos_phi1 = math.cos(phi1)
+        lambda1 = math.radians(city_lon)
+
+        if _nearest_kernel is not None:
+            idx, a = _nearest_kernel(phi1, cos_phi1, lambda1, phi, cos_phi, lam, open_)
+            if idx < 0:
+                return None, None
+            return stations[idx], 2 * R_EARTH_KM * math.asin(math.sqrt(a))
+
+        # Préfiltre sans trigonométrie par station : distance équirectangulaire (en degrés) au carré
+        dlat = lat - city_lat
+        dlon = (lon - city_lon) * cos_phi1
+        near = open_ & (dlat * dlat + dlon * dlon < (max_km / KM_PER_DEG) ** 2)
+        candidates = np.flatnonzero(near if near.any() else open_)
+        if candidates.size == 0:
+            return None, None
+
+        # Haversine vectorisé sur les stations retenues (phi, cos(phi) et lambda déjà calculés); la distance croît
+        # avec 'a' : on compare 'a' et la distance n'est calculée que pour la station la plus proche.
+        dphi = phi[candidates] - phi1
+        dlambda = lam[candidates] - lambda1
+        a = np.sin(dphi/2)**2 + cos_phi1 * cos_phi[candidates] * np.sin(dlambda/2)**2
+
+        best = int(np.argmin(a))
+        return stations[candidates[best]], 2 * R_EARTH_KM * math.asin(math.sqrt(a[best]))
 
 
     def load_stations_from_file(self, path: str) -> List[Dict[str, Any]]:
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return _load_stations(path, os.stat(path).st_mtime_ns)[0]
 
 
-    def send_command_station(self):
-        try:
-            # call_api_command(date_deb, date_fin, timeout, verify_ssl)
+    def send_command_station(self, station_id: str) -> str:
+        with self._api_errors():
+            # call_api_command(station_id, date_deb, date_fin, timeout, verify_ssl)
             data = self.call_api_command(
+                station_id=station_id,
                 date_deb=self.API_DATE_DEB,
                 date_fin=self.API_DATE_FIN,
                 timeout=self.API_TIMEOUT
             )
-        except requests.SSLError as e:
-            print("Erreur SSL/TLS lors de la vérification du certificat.", file=sys.stderr)
-            print(f"Détails: {e}", file=sys.stderr)
-            print("Astuce: réexécutez avec --insecure pour tester (non recommandé en production).", file=sys.stderr)
-            sys.exit(6)
-        except requests.HTTPError as e:
-            status = e.response.status_code if e.response else "N/A"
-            content = e.response.text if e.response else ""
-            print(f"Erreur HTTP {status}: {e}\nContenu: {content}", file=sys.stderr)
-            sys.exit(3)
-        except (requests.RequestException, ValueError) as e:
-            print(f"Erreur de requête: {e}", file=sys.stderr)
-            sys.exit(4)
+        # Réponse affichée par l'appelant avec le reste de la ville (CityResolved.command_id) : pas de print
+        # depuis les threads du pool, qui s'entremêleraient
+        return data
+
+
+    def get_and_download_file(self, city: str, command_id: str):
+        with self._api_errors():
+            self.call_api_download_file(city, command_id)
+
+
+    def process_one(self, city: Dict[str, Any]) -> Optional[CityResolved]:
+        """
+        Chaîne d'une ville : géocodage, station la plus proche, commande et téléchargement du fichier.
+        Les identifiants (station, commande) sont passés explicitement d'une étape à l'autre : plusieurs villes
+        peuvent être traitées en parallèle dans des threads. La liste des stations du département doit déjà exister.
+        Retourne un CityResolved, ou None si la ville n'a pas pu être géocodée; lève MeteoAPIError en cas d'échec.
+        """
+        city_name = city.get('name')
+        city_departement = city.get('departement')
+
+        result = self.geocode_city_with_county(city_name, city.get('county'), city.get('country', 'France'),
+                                               city.get('language', 'fr'), city_departement)
+        if result is None:
+            return None
+        _, lat, lon, label = result
+
+        nearest, _ = self.find_nearest_station(lat, lon, city_departement)
+        if nearest is None:
+            raise MeteoAPIError(f"Aucune station ouverte pour le département {city_departement}")
+
+        command_id = self.send_command_station(nearest['id'])
+        self.get_and_download_file(city_name, command_id)
+        return CityResolved(city_name, lat, lon, label, nearest['id'], command_id)
+
+
+    # Mode asynchrone : toutes les villes traitées en parallèle sur une seule aiohttp.ClientSession
+    async def _acall_api_list(self, session: "aiohttp.ClientSession", departement: str, parameter: str) -> Any:
+        url = f"{self.API_BASE_URL}/liste-stations/quotidienne"
+        params = {
+            "id-departement": str(departement),
+            "parametre": parameter,
+        }
+        async with session.get(url, params=params) as resp:
+            resp.raise_for_status()
+            try:
+                return await resp.json(loads=orjson.loads, content_type=None)
+            except orjson.JSONDecodeError:
+                raise ValueError("La réponse n'est pas un JSON valide.")
+
+
+    async def _acall_api_command(self, session: "aiohttp.ClientSession", station_id: str, date_deb: str, date_fin: str) -> str:
+        key = (station_id, date_deb, date_fin)
+        if key in self._command_ids:
+            return self._command_ids[key]
+
+        url = f"{self.API_BASE_URL}/commande-station/quotidienne"
+        params = {
+            "id-station": station_id,
+            "date-deb-periode": self.to_iso_midnight_z(date_deb),
+            "date-fin-periode": self.to_iso_midnight_z(date_fin),
+        }
+        async with session.get(url, params=params) as resp:
+            resp.raise_for_status()
+            try:
+                data = await resp.json(loads=orjson.loads, content_type=None)
+            except orjson.JSONDecodeError:
+                raise ValueError("La réponse n'est pas un JSON valide.")
+        command_id = data.get('elaboreProduitAvecDemandeResponse', {}).get('return', None)
+        if command_id is not None:
+            self._command_ids[key] = command_id
+        return command_id
+
+
+    async def _acall_api_download_file(self, session: "aiohttp.ClientSession", command_id: str, city: str):
+        """
+        Télécharge le fichier de la commande; tant que sa production est en cours, réessaie
+        avec la même attente croissante que _wait_for_file, sans bloquer les autres villes.
+        """
+        url = f"{self.API_BASE_URL}/commande/fichier"
+        params = {
+            "id-cmde": command_id,
+        }
+        city_file = Path(f"{self.API_CURRENT_DIR}\\cities\\{city}.csv")
+        city_file.parent.mkdir(parents=True, exist_ok=True)
 
-        # Affiche la réponse JSON
-        print(json.dumps(data, ensure_ascii=False, indent=2))
+        delay = POLL_DELAY
+        deadline = time.monotonic() + POLL_TIMEOUT
+        while time.monotonic() + delay <= deadline:
+            async with session.get(url, params=params) as resp:
+                if resp.status not in POLL_STATUS:
+                    resp.raise_for_status()
+                    if "json" not in resp.content_type:
+                        # Sauvegarde du contenu binaire, au fil de la réception
+                        with _atomic_write(city_file) as f:
+                            async for chunk in resp.content.iter_chunked(DOWNLOAD_CHUNK):
+                                f.write(chunk)
+                        return
+                    _file_pending(resp.content_type, await resp.read(), command_id)
+            # Connexion rendue au pool pendant l'attente
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, POLL_DELAY_MAX)
+        raise TimeoutError(f"Fichier de la commande {command_id} toujours en production après {POLL_TIMEOUT:.0f} s.")
+
+
+    async def _aprocess_city(self, session: "aiohttp.ClientSession", sem: asyncio.Semaphore, city: Dict[str, Any],
+                             departements: Dict[Tuple[Optional[str], str], "asyncio.Task"]) -> Optional[CityResolved]:
+        """
+        Chaîne complète pour une ville (stations du département, géocodage, station la plus proche, commande, fichier).
+        Retourne un CityResolved, ou None si la ville n'a pas pu être géocodée; lève MeteoAPIError en cas d'échec.
+        """
+        city_name = city.get('name')
+        city_departement = city.get('departement')
 
+        # Géocodage synchrone (geopy + RateLimiter) exécuté dans un thread pour ne pas bloquer la boucle
+        result = await asyncio.to_thread(self.geocode_city_with_county, city_name, city.get('county'),
+                                         city.get('country', 'France'), city.get('language', 'fr'), city_departement)
+        if result is None:
+            return None
+        _, lat, lon, label = result
 
-    def get_and_download_file(self, city: str):
-        self.call_api_download_file(city)
+        try:
+            # Liste des stations : une seule requête par département, partagée entre ses villes
+            await departements[_departement_key(city)]
+            nearest, _ = self.find_nearest_station(lat, lon, city_departement)
+            if nearest is None:
+                raise MeteoAPIError(f"Aucune station ouverte pour le département {city_departement}")
+
+            async with sem:
+                command_id = await self._acall_api_command(session, nearest['id'], self.API_DATE_DEB, self.API_DATE_FIN)
+            await self._acall_api_download_file(session, command_id, city_name)
+        except aiohttp.ClientResponseError as e:
+            raise MeteoHTTPError(f"Erreur HTTP {e.status}: {e}") from e
+        except (aiohttp.ClientError, asyncio.TimeoutError, TimeoutError, ValueError) as e:
+            raise MeteoAPIError(f"Erreur de requête: {e}") from e
+        return CityResolved(city_name, lat, lon, label, nearest['id'], command_id)
+
+
+    async def process_cities_async(self, cities: List[Dict[str, Any]], concurrency: int = 8) -> List[Union[CityResolved, MeteoAPIError, None]]:
+        """
+        Traite toutes les villes en parallèle (au plus 'concurrency' requêtes simultanées vers l'API).
+        Retourne une liste alignée sur 'cities' : CityResolved, None si la ville n'a pas pu être géocodée,
+        ou l'exception (MeteoAPIError) de la ville en échec; l'échec d'une ville n'interrompt pas les autres.
+        L'écriture Excel reste à la charge de l'appelant, dans l'ordre des villes.
+        """
+        if aiohttp is None:
+            raise RuntimeError("Le module 'aiohttp' est requis pour le mode asynchrone. Installez-le avec: pip install aiohttp")
+
+        sem = asyncio.Semaphore(concurrency)
+        headers = {
+            "accept": "application/json",
+            "apikey": self.API_KEY,
+        }
+        connector = aiohttp.TCPConnector(limit=concurrency, ssl=False)
+        timeout = aiohttp.ClientTimeout(sock_connect=self.API_TIMEOUT, sock_read=self.API_TIMEOUT)
+        async with aiohttp.ClientSession(connector=connector, headers=headers, timeout=timeout, trust_env=True) as session:
+
+            async def fetch_departement(departement: Any, parameter: str, force: bool):
+                _require_departement(departement)  # sans appel à l'API, comme en mode threads
+                if self._stations_up_to_date(departement, parameter, force):
+                    return
+                async with sem:
+                    data = await self._acall_api_list(session, departement, parameter)
+                self._save_stations(departement, data, force)
+                self._dep_done.add((_departement_code(departement), parameter))
+
+            # Une tâche par (département, paramètre), forcée si l'une de ses villes le demande
+            departements: Dict[Tuple[Optional[str], str], asyncio.Task] = {
+                key: asyncio.ensure_future(fetch_departement(departement, key[1], force))
+                for key, (departement, force, _) in departement_groups(cities).items()
+            }
+
+            try:
+                return await asyncio.gather(*(self._aprocess_city(session, sem, c, departements) for c in cities),
+                                            return_exceptions=True)
+            finally:
+                for task in departements.values():
+                    if task.done() and not task.cancelled():
+                        task.exception()  # déjà transmise aux villes du département (ou à aucune si non géocodées)
+                    task.cancel()
 
 
     def set_excel(self, excel_row, excel_col, city_name, city_departement, city_county):
@@ -369,27 +1058,87 @@ class Meteo:
         csv_path = f"{self.API_CURRENT_DIR}\\cities\\{city_name}.csv"
         sheet_name = "Data"
 
-        # 1) Lire le CSV (séparateur ; et décimales françaises)
-        df = pd.read_csv(csv_path, sep=";", decimal=",", dtype=str)
+        tm_values = self._read_tm_values(csv_path)
 
-        # 2) Extraire la 15e colonne (TM)
-        tm_series = df["TM"] if "TM" in df.columns else df.iloc[:, 14]
+        # print(tm_values)
+        # sys.exit(0)
 
-        # Normaliser les valeurs "françaises" -> float si possible, sinon texte
-        def parse_french_decimal(x):
-            if pd.isna(x) or str(x).strip() == "":
-                return ""
-            try:
-                return float(str(x).replace(",", "."))
-            except ValueError:
-                return str(x)
+        # 3) Écriture dans le classeur (ouvert une seule fois, enregistré par close_excel)
+        ws = self._open_excel(sheet_name)
+
+        if self._excel is None:
+            # openpyxl : écriture directe des cellules, sans Excel
+            col_idx = column_index_from_string(excel_col)
+            for row, value in enumerate((city_name, city_departement, city_county), start=1):
+                ws.cell(row=row, column=col_idx, value=value)
+            for row, value in enumerate(tm_values, start=excel_row):
+                # ws.cell(value=None) ne modifie pas la cellule : affectation directe pour vider une valeur absente
+                ws.cell(row=row, column=col_idx).value = None if value == "" else value
+            print("Écriture terminée via openpyxl")
+            return
+
+        # Un seul appel COM par plage (en-tête puis colonne TM) au lieu d'un par cellule
+        ws.Range(f"{excel_col}1:{excel_col}3").Value = ((city_name,), (city_departement,), (city_county,))
+        if tm_values:
+            end_row = excel_row + len(tm_values) - 1
+            ws.Range(f"{excel_col}{excel_row}:{excel_col}{end_row}").Value = tuple((value,) for value in tm_values)
 
-        tm_values = [parse_french_decimal(v) for v in tm_series.tolist()]
+        # # Écrire B3, B4, B5
+        # targets = ["B3", "B4", "B5"]
+        # for cell_addr, value in zip(targets, tm_values[:3]):
+        #     ws.Range(cell_addr).Value = value
 
-        # print(tm_values)
-        # sys.exit(0)
+        print("Écriture terminée via Excel COM")
+
+
+    def _read_tm_values(self, csv_path: str) -> List[Any]:
+        """
+        Valeurs de la colonne TM du CSV DPClim (séparateur ; et décimales françaises) :
+        float, "" pour une valeur absente ('' ou 'mq'), sinon le texte tel quel.
+        """
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            reader = csv.reader(f, delimiter=";")
+            header = next(reader, [])
+            # Colonne TM, sinon la 15e colonne
+            idx = header.index("TM") if "TM" in header else 14
+
+            tm_values = []
+            for row in reader:
+                if not row:
+                    continue  # ligne vide
+                value = row[idx].strip() if idx < len(row) else ""
+                if value in ("", "mq"):
+                    tm_values.append("")
+                    continue
+                try:
+                    tm_values.append(float(value.replace(",", ".")))
+                except ValueError:
+                    tm_values.append(value)
+            return tm_values
+
+
+    def _open_excel(self, sheet_name: str):
+        """
+        Classeur et feuille obtenus à la première écriture puis réutilisés pour toutes les villes.
+        Classeur fermé : chargé avec openpyxl (self._excel reste None), sans Excel.
+        Classeur ouvert dans Excel (fichier verrou '~$') : écriture via COM, sans rafraîchissement de l'écran,
+        ni recalcul, ni événements jusqu'à close_excel.
+        """
+        if self._ws is not None:
+            return self._ws
+
+        if load_workbook is not None and not _excel_locked(self.API_EXCEL_FILE):
+            wb = load_workbook(self.API_EXCEL_FILE, keep_vba=self.API_EXCEL_FILE.lower().endswith(".xlsm"))
+            self._wb, self._ws = wb, wb[sheet_name]
+            return self._ws
+
+        if win32 is None:
+            raise RuntimeError(
+                f"Impossible d'écrire dans {self.API_EXCEL_FILE} : fermez le classeur dans Excel "
+                "(écriture via openpyxl : pip install openpyxl) ou installez pywin32 (pip install pywin32)."
+            )
 
-        # 3) Écriture dans Excel via COM (même si le fichier est ouvert)
+        # Écriture dans Excel via COM (le fichier est ouvert)
         excel = win32.Dispatch("Excel.Application")
 
         # Si le classeur est déjà ouvert dans Excel, on le récupère; sinon on l'ouvre
@@ -406,23 +1155,32 @@ class Meteo:
         if wb is None:
             wb = excel.Workbooks.Open(self.API_EXCEL_FILE)
 
-        ws = wb.Worksheets(sheet_name)
+        self._excel_settings = (excel.ScreenUpdating, excel.Calculation, excel.EnableEvents)
+        excel.ScreenUpdating = False
+        excel.Calculation = XL_CALCULATION_MANUAL
+        excel.EnableEvents = False
 
-        ws.Range(f"{excel_col}1").Value = city_name
-        ws.Range(f"{excel_col}2").Value = city_departement
-        ws.Range(f"{excel_col}3").Value = city_county
-        for value in tm_values:
-            cell_addr = f"{excel_col}{excel_row}"
-            ws.Range(cell_addr).Value = value
-            excel_row += 1
+        self._excel, self._wb, self._ws = excel, wb, wb.Worksheets(sheet_name)
+        return self._ws
 
-        # # Écrire B3, B4, B5
-        # targets = ["B3", "B4", "B5"]
-        # for cell_addr, value in zip(targets, tm_values[:3]):
-        #     ws.Range(cell_addr).Value = value
 
-        # Sauvegarder (si ouvert en lecture seule, Excel te le signalera)
-        wb.Save()
-        wb.Close(SaveChanges=True)  # si tu veux fermer après
-
-        print("Écriture terminée via Excel COM")
+    def close_excel(self):
+        """
+        Enregistre le classeur une seule fois, après toutes les villes.
+        Via COM : rétablit les réglages d'Excel et ferme le classeur ; Excel est quitté s'il n'a plus aucun classeur ouvert.
+        """
+        if self._wb is None:
+            return
+        excel, wb = self._excel, self._wb
+        self._excel = self._wb = self._ws = None
+        if excel is None:
+            wb.save(self.API_EXCEL_FILE)
+            return
+        try:
+            excel.ScreenUpdating, excel.Calculation, excel.EnableEvents = self._excel_settings
+            # Sauvegarder (si ouvert en lecture seule, Excel te le signalera)
+            wb.Save()
+            wb.Close(SaveChanges=True)
+        finally:
+            if excel.Workbooks.Count == 0:
+                excel.Quit()
@@ -2,17 +2,28 @@
 # -*- coding: utf-8 -*-
 
 import os
+import re
 import sys
-import json
+import asyncio
 import argparse
-from datetime import date, datetime
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date
+from functools import partial
 from pathlib import Path
-from meteo import Meteo
+import orjson
+from meteo import Meteo, MeteoAPIError, aiohttp, departement_groups, departement_name
 import string
 
+# AAAA-MM-DD strict : chiffres ASCII uniquement
+_DATE_RE = re.compile(r"(\d{4})-(\d{2})-(\d{2})", re.ASCII)
+
 def parse_date(value: str) -> date:
+    # Regex puis date(), qui vérifie que le mois et le jour existent (sans strptime)
+    match = _DATE_RE.fullmatch(value)
     try:
-        return datetime.strptime(value, "%Y-%m-%d").date()
+        if match is None:
+            raise ValueError(value)
+        return date(*map(int, match.groups()))
     except ValueError:
         raise argparse.ArgumentTypeError(
             "Format de date invalide, attendu AAAA-MM-DD"
@@ -31,6 +42,9 @@ def main():
     parser.add_argument("--parameter", "-p", default="temperature", help="Paramètre de climatologie.")
     parser.add_argument("--timeout", "-t", type=float, default=10.0, help="Timeout en secondes.")
     parser.add_argument("--force", "-f", action="store_true", help="Force la mise à jour de toutes les données.")
+    parser.add_argument("--workers", "-w", type=int, default=8, help="Nombre de villes traitées en parallèle (défaut: 8).")
+    parser.add_argument("--async", dest="async_mode", action="store_true", help="Traite toutes les villes en parallèle (requiert aiohttp).")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requêtes API simultanées en mode --async (défaut: 8).")
     args = parser.parse_args()
         
     # # DEBUG
@@ -49,27 +63,37 @@ def main():
         sys.exit(3)
 
     today = date.today()
-    # Valeur par défaut
-    if args.date_fin is None:
-        args.date_fin = str(today)
-    # Si date-fin > aujourd'hui → on force aujourd'hui
-    elif args.date_fin > today:
-        args.date_fin = str(today)
-
-    # Validation simple des dates (et conversion se fait dans call_api)
-    for label, d in (("--date-deb", args.date_deb), ("--date-fin", args.date_fin)):
-        try:
-            datetime.strptime(d, "%Y-%m-%d")
-        except ValueError:
-            print(f"Erreur: {label} invalide '{d}'. Format attendu: AAAA-MM-DD.", file=sys.stderr)
-            sys.exit(4)
+    # Valeur par défaut : aujourd'hui ; si date-fin > aujourd'hui → on force aujourd'hui
+    date_fin = min(args.date_fin or today, today)
+
+    # Validation simple de la date de début (et conversion se fait dans call_api)
+    try:
+        date_deb = parse_date(args.date_deb)
+    except argparse.ArgumentTypeError:
+        print(f"Erreur: --date-deb invalide '{args.date_deb}'. Format attendu: AAAA-MM-DD.", file=sys.stderr)
+        sys.exit(4)
 
     # Vérifier que date_deb <= date_fin
-    if args.date_deb > args.date_fin:
+    if date_deb > date_fin:
         print("Erreur: date-deb doit être antérieure ou égale à date-fin.", file=sys.stderr)
         sys.exit(5)
 
-    meteo = Meteo(
+    args.date_deb, args.date_fin = date_deb.isoformat(), date_fin.isoformat()
+
+    cities_file = Path(args.inputs_file)
+    if cities_file.exists():
+        cities = orjson.loads(cities_file.read_bytes())
+        if not isinstance(cities, list):
+            raise ValueError("Le fichier JSON ne contient pas une liste")
+    else:
+        print("Erreur: fournissez --inputs-file", file=sys.stderr)
+        raise RuntimeError("Fichier JSON contenant la liste de dictionnaire avec les informations des villes à traiter introuvable.")
+        
+    # # DEBUG
+    # print(f"cities = {orjson.dumps(cities, option=orjson.OPT_INDENT_2).decode('utf-8')}")
+    # os._exit(0)
+
+    with Meteo(
         api_base_url=args.api_url,
         api_key=args.api_key,
         current_dir=os.getcwd(),
@@ -81,85 +105,153 @@ def main():
         country=args.country,
         language=args.language,
         timeout=args.timeout,
-        force=args.force
-    )
+        force=args.force,
+        workers=max(1, args.workers)
+    ) as meteo:
+        # # DEBUG
+        # print(f"API_BASE_URL = {meteo.API_BASE_URL}")
+        # print(f"API_KEY = {meteo.API_KEY}")
+        # print(f"API_DATE_DEB = {meteo.API_DATE_DEB}")
+        # print(f"API_DATE_FIN = {meteo.API_DATE_FIN}")
+        # print(f"API_FORCE = {meteo.API_FORCE}")
+        # os._exit(0)
 
-    # # DEBUG
-    # print(f"API_BASE_URL = {meteo.API_BASE_URL}")
-    # print(f"API_KEY = {meteo.API_KEY}")
-    # print(f"API_DATE_DEB = {meteo.API_DATE_DEB}")
-    # print(f"API_DATE_FIN = {meteo.API_DATE_FIN}")
-    # print(f"API_FORCE = {meteo.API_FORCE}")
-    # os._exit(0)
+        # Bounding boxes des départements (fallback du géocodage) : récupérées une seule fois, puis lues sur disque;
+        # inutiles pour les départements dont toutes les villes sont déjà dans le cache des géocodages
+        departements = sorted({str(c.get('departement')) for c in cities
+                               if c.get('departement') is not None and not meteo.is_geocoded(c)})
+        meteo.prefetch_departement_bboxes(departements, args.country, args.language)
 
-    cities_file = Path(args.inputs_file)
-    if cities_file.exists():
-        with cities_file.open("r", encoding="utf-8") as f:
-            cities = json.load(f)
-            if not isinstance(cities, list):
-                raise ValueError("Le fichier JSON ne contient pas une liste")
-    else:
-        print("Erreur: fournissez --inputs-file", file=sys.stderr)
-        raise RuntimeError("Fichier JSON contenant la liste de dictionnaire avec les informations des villes à traiter introuvable.")
-        
-    # # DEBUG
-    # print(f"cities = {json.dumps(cities, ensure_ascii=False, indent=2)}")
-    # os._exit(0)
+        if args.async_mode:
+            run_async(meteo, cities, max(1, args.concurrency))
+            return
 
-    excel_col_index = 1
-    for city in cities:
-        city_name = city.get('name')
-        city_departement = city.get('departement')
-        city_county = city.get('county')
-        city_country = city.get('country', 'France')
-        city_language = city.get('language', 'fr')
-        city_parameter = city.get('parameter', 'temperature')
-        city_force = city.get('force', False)
+        # Villes traitées en parallèle (géocodage, station, commande, fichier) : attentes réseau recouvertes.
+        # L'écriture Excel (openpyxl ou COM, non thread-safe) reste dans ce thread, dans l'ordre des villes,
+        # et commence dès que la première ville est prête.
+        with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+            futures = submit_cities(executor, meteo, cities)
+            report(meteo, cities, iter_results(futures))
+
+
+def submit_cities(executor: ThreadPoolExecutor, meteo: Meteo, cities: list) -> list:
+    """
+    Villes regroupées par (département, paramètre) : une tâche par groupe (liste des stations, forcée si l'une
+    de ses villes le demande), puis, dès qu'elle est terminée, les villes du groupe sont soumises au pool ;
+    aucun thread n'attend une liste. Un groupe en échec n'arrête que ses villes.
+    Les futures retournés restent dans l'ordre des villes.
+    """
+    futures = [Future() for _ in cities]
+
+    def forward(target: Future, source: Future):
+        if source.exception() is not None:
+            target.set_exception(source.exception())
+        else:
+            target.set_result(source.result())
+
+    def submit_group(indexes: list, departement_future: Future):
+        for index in indexes:
+            if departement_future.exception() is not None:
+                futures[index].set_exception(departement_future.exception())
+                continue
+            try:
+                future = executor.submit(meteo.process_one, cities[index])
+            except RuntimeError as e:  # pool arrêté (erreur pendant l'écriture Excel)
+                futures[index].set_exception(e)
+                continue
+            future.add_done_callback(partial(forward, futures[index]))
+
+    for (_, parameter), (city_departement, force, indexes) in departement_groups(cities).items():
+        departement_future = executor.submit(meteo.write_stations_by_departement, city_departement, parameter, force)
+        departement_future.add_done_callback(partial(submit_group, indexes))
+
+    return futures
+
+
+def iter_results(futures: list):
+    """
+    Résultats dans l'ordre des villes, au fur et à mesure : CityResolved, None (non géocodée) ou MeteoAPIError.
+    """
+    for future in futures:
+        try:
+            yield future.result()
+        except MeteoAPIError as e:
+            yield e
 
-        # # DEBUG
-        # print(f"city_name = {city_name}")
-        # print(f"city_departement = {city_departement}")
-        # print(f"city_county = {city_county}")
-        # print(f"city_country = {city_country}")
-        # print(f"city_language = {city_language}")
-        # print(f"city_parameter = {city_parameter}")
-        # print(f"city_force = {city_force}")
-        # os._exit(0)
 
-        meteo.write_stations_by_departement(city_departement, city_parameter, city_force)
+def run_async(meteo: Meteo, cities: list, concurrency: int):
+    """
+    Mode --async : API et géocodage pour toutes les villes en parallèle, puis écriture Excel dans l'ordre des villes.
+    """
+    if aiohttp is None:
+        print("Le module 'aiohttp' est requis pour --async. Installez-le avec: pip install aiohttp", file=sys.stderr)
+        sys.exit(1)
 
-        result = meteo.geocode_city_with_county(city_name, city_county, city_country, city_language)
+    results = asyncio.run(meteo.process_cities_async(cities, concurrency))
+    for result in results:
+        # Exceptions autres que MeteoAPIError : erreurs de programmation, non masquées
+        if isinstance(result, BaseException) and not isinstance(result, MeteoAPIError):
+            raise result
+
+    report(meteo, cities, results)
+
+
+def report(meteo: Meteo, cities: list, results):
+    """
+    Affiche le résultat de chaque ville et l'écrit dans sa colonne Excel (à partir de B, dans l'ordre du fichier
+    d'entrées), puis sort avec le code de la première ville en échec (1 : non géocodée, sinon MeteoAPIError.exit_code).
+    Les villes en échec laissent leur colonne telle quelle : les autres gardent la leur.
+    'results' peut être un itérateur : chaque ville est écrite dès que son résultat est disponible.
+    """
+    exit_code = 0
+    for excel_col_index, (city, result) in enumerate(zip(cities, results), start=1):
+        city_departement = city.get('departement')
+        city_country = city.get('country', 'France')
         if result is None:
-            print(f"Aucune coordonnée trouvée pour: {city_name}, département {city_departement}, country {city_country}")
-            sys.exit(1)
-        city, lat, lon, label = result
-    
+            print(f"Aucune coordonnée trouvée pour: {city.get('name')}, département {city_departement}, country {city_country}")
+            exit_code = exit_code or 1
+            continue
+        if isinstance(result, MeteoAPIError):
+            print(f"Erreur pour {city.get('name')}, département {city_departement}: {result}", file=sys.stderr)
+            exit_code = exit_code or result.exit_code
+            continue
+
         # DEBUG
         print()
-        print(f"Ville:      {city}, département {city_departement}, {city_country}")
-        print(f"Latitude:   {lat:.6f}")
-        print(f"Longitude:  {lon:.6f}")
-        print(f"Résultat:   {label}")
+        print(f"Ville:      {result.name}, département {city_departement}, {city_country}")
+        print(f"Latitude:   {result.lat:.6f}")
+        print(f"Longitude:  {result.lon:.6f}")
+        print(f"Résultat:   {result.label}")
+        print(f"Station:    {result.station_id}")
+        print(f"Commande:   {result.command_id}")
         print()
-        
-        nearest = meteo.find_nearest_station(lat, lon, city_departement)
-        print(nearest)
-
-        meteo.send_command_station()
-        meteo.get_and_download_file(city_name)
-
-        # Générer les lettres simples A-Z
-        letters = list(string.ascii_uppercase)
-        # Générer les combinaisons AA-ZZ
-        col_letters = letters[:]  # commence avec A-Z
-        for first in letters:
-            for second in letters:
-                col_letters.append(first + second)
-
-        excel_row = 4
-        excel_col = col_letters[excel_col_index]
-        meteo.set_excel(excel_row, excel_col, city_name, city_departement, city_county)
-        excel_col_index += 1
+
+        write_excel(meteo, excel_col_index, city)
+
+    if exit_code:
+        sys.exit(exit_code)
+
+
+def write_excel(meteo: Meteo, excel_col_index: int, city: dict):
+    """
+    Écrit la ville dans la colonne Excel d'indice 'excel_col_index' (1 : B).
+    """
+    excel_row = 4
+    city_departement = city.get('departement')
+    city_county = city.get('county') or departement_name(city_departement)
+    meteo.set_excel(excel_row, col_letter(excel_col_index), city.get('name'), city_departement, city_county)
+
+
+def col_letter(index: int) -> str:
+    """
+    Lettres de la colonne Excel d'indice 'index' (0 : A, 25 : Z, 26 : AA...).
+    """
+    letters = ""
+    index += 1
+    while index:
+        index, rest = divmod(index - 1, 26)
+        letters = string.ascii_uppercase[rest] + letters
+    return letters
 
 
 if __name__ == "__main__":